@@ -0,0 +1,196 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+# Importing headless sets up the dummy display and audio drivers, worker processes inherit them
+import headless
+
+import pygame
+
+import inputs
+import levels
+import resources
+import settings
+import states
+
+# Keys a random agent holds down, it leans towards walking right since that is where the exits usually are
+random_moves = [
+    [pygame.K_d],
+    [pygame.K_d],
+    [pygame.K_d, pygame.K_SPACE],
+    [pygame.K_d, pygame.K_SPACE],
+    [pygame.K_a],
+    [pygame.K_a, pygame.K_SPACE],
+    [pygame.K_SPACE],
+    [],
+]
+
+# Get the order the levels are played in for a seed, the same order main.randomize_level_order picks after random.seed(seed)
+def level_order(seed, names):
+    rng = random.Random(seed)
+    remaining = list(names)
+    order = []
+    while remaining:
+        order.append(remaining.pop(rng.randrange(0, len(remaining))))
+    return order
+
+# Make the input of a random agent, every seed and level gets its own reproducible run
+# The agent holds a random set of keys for a while, jumps now and then and sometimes casts lightning at a random spot
+# It presses W on every step, so it goes through an exit as soon as it stands in one
+def random_agent(seed, name, steps):
+    rng = random.Random("{}:{}".format(seed, name))
+    script = []
+    use_exit = pygame.event.Event(pygame.KEYDOWN, key=pygame.K_w)
+
+    while len(script) < steps:
+        keys = rng.choice(random_moves)
+        events = [use_exit]
+        if pygame.K_SPACE in keys:
+            events.append(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_SPACE))
+        if rng.random() < 0.2:
+            events.append(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(rng.randrange(800), rng.randrange(600)), button=1))
+
+        script.append((keys, events))
+        script.extend((keys, [use_exit]) for step in range(rng.randrange(10, 60)))
+
+    return inputs.Scripted_Input(script[:steps])
+
+# Get the input an agent plays a level with, agent is either "random" or the path of an input script
+def agent_input(agent, seed, name, steps):
+    if agent == "random":
+        return random_agent(seed, name, steps)
+    return inputs.load_script(agent)
+
+# Levels built by this worker process, so every level is only built once per worker and reset between runs
+worker_levels = {}
+
+# Set up a worker process
+# Settings are passed in instead of inherited, workers that are spawned instead of forked start from a fresh settings module
+def init_worker(vector_physics):
+    settings.vector_physics = vector_physics
+    resources.init()
+
+# Run one job in a worker process
+# A job plays a list of levels in order with an agent, and stops at the first level the agent doesn't finish
+# Returns the job with a result for every level that was played
+def run_job(job):
+    result = dict(job, runs=[])
+
+    for name in job["levels"]:
+        if name not in worker_levels:
+            worker_levels[name] = states.Level(name)
+
+        start = time.perf_counter()
+        run = headless.run(worker_levels[name], job["steps"], agent_input(job["agent"], job["seed"], name, job["steps"]))
+        run["level"] = name
+        run["seconds"] = time.perf_counter() - start
+        result["runs"].append(run)
+
+        if not run["completed"]:
+            break
+
+    return result
+
+# Make every level/seed/agent combination to run
+# Scripts play a level the same way every time, so they only play every level once, with the first seed
+# With orders, every seed also plays through all of the levels in the randomized order the game would pick for it
+def make_jobs(names, seeds, agents, steps, orders):
+    jobs = []
+    for seed_num, seed in enumerate(seeds):
+        for agent in agents:
+            if agent == "random" or seed_num == 0:
+                for name in names:
+                    jobs.append({"levels": [name], "seed": seed, "agent": agent, "steps": steps})
+            if orders:
+                jobs.append({"levels": level_order(seed, names), "seed": seed, "agent": agent, "steps": steps})
+    return jobs
+
+# Add up the results of every job, per level and for the randomized level orders
+def aggregate(results, names):
+    report = {"levels": {}, "orders": {"runs": 0, "completed": 0}, "jobs": len(results)}
+    for name in names:
+        report["levels"][name] = {"runs": 0, "completed": 0, "deaths": 0, "steps_to_complete": []}
+
+    for result in results:
+        for run in result["runs"]:
+            level = report["levels"][run["level"]]
+            level["runs"] += 1
+            level["deaths"] += run["deaths"]
+            if run["completed"]:
+                level["completed"] += 1
+                level["steps_to_complete"].append(run["steps"])
+
+        if len(result["levels"]) > 1:
+            report["orders"]["runs"] += 1
+            if len(result["runs"]) == len(result["levels"]) and result["runs"][-1]["completed"]:
+                report["orders"]["completed"] += 1
+
+    for level in report["levels"].values():
+        steps = level.pop("steps_to_complete")
+        level["min_steps"] = min(steps) if steps else None
+        level["mean_steps"] = sum(steps) / len(steps) if steps else None
+
+    return report
+
+# Run levels in a pool of worker processes from the command line
+def main():
+    parser = argparse.ArgumentParser(description="Play levels with scripted or random agents on every core and report which levels were completed")
+    parser.add_argument("scripts", nargs="*", help="input scripts to play every level with, see inputs.load_script")
+    parser.add_argument("--levels", nargs="+", metavar="NAME", help="levels to run (default: all levels)")
+    parser.add_argument("--seeds", type=int, default=8, help="how many seeds to run every agent with")
+    parser.add_argument("--first-seed", type=int, default=0, help="first seed to run")
+    parser.add_argument("--random-agent", action="store_true", help="also play with a random agent (always used without scripts)")
+    parser.add_argument("--orders", action="store_true", help="also play through the randomized level order of every seed")
+    parser.add_argument("--steps", type=int, default=3600, help="most simulation steps to run a level for")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="how many worker processes to use")
+    parser.add_argument("--vector-physics", action="store_true", help="move the player with the batched numpy physics")
+    parser.add_argument("--output", metavar="PATH", help="write the full report to a json file")
+    args = parser.parse_args()
+
+    names = args.levels or levels.level_names()
+    agents = list(args.scripts)
+    if args.random_agent or not agents:
+        agents.append("random")
+
+    # Compile the levels once up front, so the workers don't all race to compile them
+    for name in names:
+        levels.load(name)
+
+    jobs = make_jobs(names, range(args.first_seed, args.first_seed + args.seeds), agents, args.steps, args.orders)
+
+    start = time.perf_counter()
+    pool = multiprocessing.Pool(args.workers, initializer=init_worker, initargs=(args.vector_physics,))
+    results = list(pool.imap_unordered(run_job, jobs, chunksize=max(1, len(jobs) // (args.workers * 4))))
+
+    # Let the workers exit on their own, terminating a worker that has initialized pygame can leave it hanging
+    pool.close()
+    pool.join()
+    elapsed = time.perf_counter() - start
+
+    report = aggregate(results, names)
+
+    for name, level in report["levels"].items():
+        print("{:<12} {:>4}/{:<4} completed  {:>6} deaths  fastest {}".format(
+            name, level["completed"], level["runs"], level["deaths"],
+            "{} steps".format(level["min_steps"]) if level["min_steps"] is not None else "-"))
+    if args.orders:
+        print("{:<12} {:>4}/{:<4} completed".format("orders", report["orders"]["completed"], report["orders"]["runs"]))
+    print("{} jobs on {} workers in {:.2f} seconds".format(len(jobs), args.workers, elapsed))
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(dict(report, results=sorted(results, key=lambda result: (result["seed"], result["agent"], result["levels"]))),
+                      output, indent=2)
+
+    # Fail if any level was never completed, so a build box can use this as a solvability check
+    unsolved = [name for name, level in report["levels"].items() if level["completed"] == 0]
+    if unsolved:
+        print("Never completed: " + ", ".join(unsolved))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
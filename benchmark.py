@@ -0,0 +1,190 @@
+import argparse
+import json
+import os
+import platform
+import time
+
+# Run without opening a window, this has to be set before pygame is initialized
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+import settings
+import states
+import inputs
+import levels
+import resources
+
+# Level that is built from level data instead of a level file, used for the synthetic benchmark levels
+class Synthetic_Level(states.Level):
+    # Initialize the synthetic level
+    def __init__(self, name, level_data):
+        states.Level.__init__(self, name)
+        self.level_data = level_data
+
+    # Get the level data of the synthetic level
+    def load_level(self):
+        return self.level_data
+
+# Make level data that is scale times as wide as the original levels
+# The inside of every level is repeated without its side borders, and every copy gets its own door and generator ids
+def synthetic_level(scale):
+    sources = [levels.load(name).to_rows() for name in levels.level_names()]
+    width = 25 * scale
+
+    rows = [[1] for row in range(20)]
+    copy = 0
+    while len(rows[0]) < width - 1:
+        source = sources[copy % len(sources)]
+        copy += 1
+        for row in range(20):
+            for cols in source[row][1:-1]:
+                if len(rows[row]) == width - 1:
+                    break
+                if "d" in str(cols) or "g" in str(cols):
+                    cols = cols[0] + str(copy)
+                rows[row].append(cols)
+
+    for row in rows:
+        row.append(1)
+    return levels.Level_Data.from_rows(rows)
+
+# Script that walks right and keeps jumping, so the camera scrolls through the level
+def benchmark_input(steps):
+    script = []
+    for step in range(steps):
+        if step % 40 == 0:
+            script.append(([pygame.K_d, pygame.K_SPACE], [pygame.event.Event(pygame.KEYDOWN, key=pygame.K_SPACE)]))
+        else:
+            script.append(([pygame.K_d, pygame.K_SPACE] if step % 40 < 20 else [pygame.K_d], []))
+    return inputs.Scripted_Input(script)
+
+# Get the mean, 95th and 99th percentile of a list of times in seconds, in milliseconds
+def summarize(times):
+    ordered = sorted(times)
+
+    # Nearest rank percentile
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))] * 1000
+
+    return {
+        "samples": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "max_ms": ordered[-1] * 1000,
+    }
+
+# Benchmark the frame pipeline of a level
+# Bolts is how many lightning bolts are kept alive at once, spread over the camera
+def benchmark_level(level, steps, builds, bolts):
+    screen = pygame.Surface((settings.display_width, settings.display_height))
+    timings = {"create_level": [], "Player.movement": [], "Level.updates": [], "Level.draws": []}
+
+    # Building the whole level, create_level and everything init_level sets up around it
+    level_data = level.load_level()
+    for build in range(builds):
+        start = time.perf_counter()
+        level.build(level_data)
+        timings["create_level"].append(time.perf_counter() - start)
+
+    level.controls = benchmark_input(steps)
+    level.startup()
+
+    for step in range(steps):
+        for event in level.controls.next_step():
+            level.get_event(event)
+
+        # Keep the level full of lightning bolts
+        for bolt in range(bolts - len(level.magic)):
+            level.magic.add(level.player.attack(level, (bolt * 97 + step * 13) % settings.display_width))
+
+        start = time.perf_counter()
+        level.player.movement()
+        timings["Player.movement"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        level.updates()
+        timings["Level.updates"].append(time.perf_counter() - start)
+
+        level.test_for_exits(level.player)
+
+        start = time.perf_counter()
+        level.draws(screen)
+        timings["Level.draws"].append(time.perf_counter() - start)
+
+    return {name: summarize(times) for name, times in timings.items()}
+
+# Benchmark the menu, both the usual frame where nothing changed and a frame where everything is drawn again
+def benchmark_menu(steps):
+    screen = pygame.Surface((settings.display_width, settings.display_height))
+    menu = states.Menu()
+    timings = {"Menu.draw": [], "Menu.draw (full)": []}
+
+    for step in range(steps):
+        menu.update()
+        start = time.perf_counter()
+        menu.draw(screen)
+        timings["Menu.draw"].append(time.perf_counter() - start)
+
+        menu.drawn_colors = None
+        start = time.perf_counter()
+        menu.draw(screen)
+        timings["Menu.draw (full)"].append(time.perf_counter() - start)
+
+    return {name: summarize(times) for name, times in timings.items()}
+
+# Print how much every timing has changed since an earlier run
+def compare(results, old_results):
+    for name, timings in results.items():
+        for timing, stats in timings.items():
+            old_stats = old_results.get(name, {}).get(timing)
+            if old_stats is None:
+                continue
+            print("{:<16} {:<18} mean {:+7.1f}%   p95 {:+7.1f}%".format(
+                name, timing,
+                (stats["mean_ms"] / old_stats["mean_ms"] - 1) * 100 if old_stats["mean_ms"] else 0,
+                (stats["p95_ms"] / old_stats["p95_ms"] - 1) * 100 if old_stats["p95_ms"] else 0))
+
+# Run the benchmarks from the command line
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the frame pipeline")
+    parser.add_argument("--steps", type=int, default=600, help="simulation steps to run on every level")
+    parser.add_argument("--builds", type=int, default=20, help="times to build every level")
+    parser.add_argument("--bolts", type=int, default=20, help="lightning bolts to keep alive on the synthetic levels")
+    parser.add_argument("--scales", type=int, nargs="*", default=[10, 100], help="widths of the synthetic levels, in original level widths")
+    parser.add_argument("--output", default="benchmark.json", help="file to write the results to")
+    parser.add_argument("--compare", metavar="PATH", help="results file of an earlier run to compare with")
+    args = parser.parse_args()
+
+    resources.init()
+
+    results = {"menu": benchmark_menu(args.steps)}
+
+    for name in levels.level_names():
+        results[name] = benchmark_level(states.Level(name), args.steps, args.builds, 0)
+
+    for scale in args.scales:
+        level = Synthetic_Level("synthetic_{}x".format(scale), synthetic_level(scale))
+        results["synthetic_{}x".format(scale)] = benchmark_level(level, args.steps, max(1, args.builds // scale), args.bolts)
+
+    for name, timings in results.items():
+        for timing, stats in timings.items():
+            print("{:<16} {:<18} mean {:8.4f} ms   p95 {:8.4f} ms   p99 {:8.4f} ms".format(
+                name, timing, stats["mean_ms"], stats["p95_ms"], stats["p99_ms"]))
+
+    with open(args.output, "w") as output:
+        json.dump({
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "steps": args.steps,
+            "results": results,
+        }, output, indent=2)
+
+    if args.compare:
+        with open(args.compare) as old_output:
+            compare(results, json.load(old_output)["results"])
+
+if __name__ == "__main__":
+    main()
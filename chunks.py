@@ -0,0 +1,56 @@
+import pygame
+
+import settings
+import sprites
+import tiles
+
+# Chunk class, a block of settings.chunk_width by settings.chunk_height tiles of a level
+# Chunks only exist while they are near the camera, so the blocks and surfaces of a level don't grow with its size
+class Chunk:
+    __slots__ = ("index", "rect", "walls", "exits", "surface", "dirty")
+
+    # Initialize the chunk class, creating the blocks of the walls and exits of the chunk at index, a (chunk column, chunk row) pair
+    # Level is the planned level data and level_y is where its top row is on the screen
+    def __init__(self, index, level, level_y):
+        self.index = index
+        self.rect = pygame.Rect(index[0] * settings.chunk_width * 32, level_y + index[1] * settings.chunk_height * 32,
+                                settings.chunk_width * 32, settings.chunk_height * 32)
+
+        self.walls = [sprites.Block(col * 32, level_y + row * 32, width * 32, height * 32)
+                      for col, row, width, height in level.chunk_walls[index]]
+        self.exits = [sprites.Block(col * 32, level_y + row * 32, 32, 32, color=settings.green, solid=False)
+                      for col, row in level.chunk_exits.get(index, ())]
+
+        # The surface is only drawn once the chunk is on screen, so running a level without a display never draws it
+        self.surface = None
+        self.dirty = True
+
+    # Draw the static tiles of the chunk (walls, exits and generators) to surface, a chunk sized surface that becomes the chunk's surface
+    def render(self, surface, level, level_y, generators):
+        self.surface = surface
+        self.surface.fill(settings.white)
+
+        # With a tileset atlas, the walls are drawn tile by tile from their auto-tiled pieces instead of as plain rectangles
+        atlas = tiles.get_atlas()
+        if atlas is not None:
+            self.render_wall_tiles(atlas, level, level_y)
+
+        for static_tiles in self.walls + self.exits + [generators for generators in generators if generators.rect.colliderect(self.rect)]:
+            if atlas is None or not static_tiles.solid:
+                self.surface.blit(static_tiles.image, static_tiles.rect.move(-self.rect.x, -self.rect.y))
+
+        self.dirty = False
+
+    # Draw the wall tiles of the chunk to its surface
+    def render_wall_tiles(self, atlas, level, level_y):
+        first_col = self.rect.left // 32
+        last_col = min(level.width, self.rect.right // 32)
+        first_row = (self.rect.top - level_y) // 32
+        last_row = min(level.height, (self.rect.bottom - level_y) // 32)
+
+        for row in range(first_row, last_row):
+            for col in range(first_col, last_col):
+                piece = level.wall_pieces[row * level.width + col]
+                if piece:
+                    atlas.draw(self.surface, atlas.tile_id(settings.wall_tileset, piece),
+                               (col * 32 - self.rect.x, level_y + row * 32 - self.rect.y))
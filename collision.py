@@ -0,0 +1,97 @@
+# Uniform grid spatial index, used so collision only checks the cells a rect overlaps
+class Spatial_Grid:
+    # Initialize the spatial grid class
+    def __init__(self, cell_size=32):
+        self.cell_size = cell_size
+
+        # Maps (col, row) to the list of sprites overlapping that cell
+        self.cells = {}
+
+        # Maps each sprite to the cells it is currently stored in (used for moving sprites)
+        self.sprite_cells = {}
+
+    # Get the cells a rect overlaps
+    def cells_for(self, rect):
+        left = rect.left // self.cell_size
+        right = (rect.right - 1) // self.cell_size
+        top = rect.top // self.cell_size
+        bottom = (rect.bottom - 1) // self.cell_size
+
+        return [(col, row) for row in range(top, bottom + 1) for col in range(left, right + 1)]
+
+    # Add a sprite to every cell its rect overlaps
+    def add(self, *sprites):
+        for sprite in sprites:
+            cells = self.cells_for(sprite.rect)
+            for cell in cells:
+                self.cells.setdefault(cell, []).append(sprite)
+            self.sprite_cells[sprite] = cells
+
+    # Remove a sprite from the grid
+    def remove(self, sprite):
+        for cell in self.sprite_cells.pop(sprite, []):
+            self.cells[cell].remove(sprite)
+            if not self.cells[cell]:
+                del self.cells[cell]
+
+    # Re-bucket a sprite after its rect has moved, only touching the grid if its cells changed
+    def move(self, sprite):
+        if sprite not in self.sprite_cells:
+            return
+
+        cells = self.cells_for(sprite.rect)
+        if cells != self.sprite_cells[sprite]:
+            self.remove(sprite)
+            for cell in cells:
+                self.cells.setdefault(cell, []).append(sprite)
+            self.sprite_cells[sprite] = cells
+
+    # Get every sprite stored in the cells a rect overlaps, without duplicates
+    def query(self, rect):
+        found = {}
+        for cell in self.cells_for(rect):
+            for sprite in self.cells.get(cell, ()):
+                found[sprite] = None
+
+        return list(found)
+
+    # Get the sprites that actually collide with a rect (same result as pygame.sprite.spritecollide)
+    def collide(self, rect):
+        return [sprite for sprite in self.query(rect) if rect.colliderect(sprite.rect)]
+
+    # Iterate over every sprite in the grid
+    def __iter__(self):
+        return iter(list(self.sprite_cells))
+
+    def __len__(self):
+        return len(self.sprite_cells)
+
+# Merge a grid of solid cells into as few axis-aligned rectangles as possible
+# Solid is a list of rows of booleans, returns a list of (col, row, width, height) in cells
+def merge_tiles(solid):
+    used = [[False] * len(rows) for rows in solid]
+    rects = []
+
+    for row in range(len(solid)):
+        for col in range(len(solid[row])):
+            if not solid[row][col] or used[row][col]:
+                continue
+
+            # Grow the rectangle to the right as far as the run of solid cells goes
+            width = 1
+            while col + width < len(solid[row]) and solid[row][col + width] and not used[row][col + width]:
+                width += 1
+
+            # Then grow it downwards while the whole run below is solid too
+            height = 1
+            while row + height < len(solid) and all(col + i < len(solid[row + height]) and solid[row + height][col + i]
+                                                    and not used[row + height][col + i] for i in range(width)):
+                height += 1
+
+            for y in range(row, row + height):
+                for x in range(col, col + width):
+                    used[y][x] = True
+
+            rects.append((col, row, width, height))
+
+    return rects
@@ -0,0 +1,58 @@
+import argparse
+import os
+import time
+
+# Run without opening a window, this has to be set before pygame is initialized
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import inputs
+import resources
+import states
+
+# Run a level for a number of simulation steps as fast as possible, with drawing turned off
+# Controls is a Scripted_Input that replaces the keyboard and the event queue
+# Returns a dict with the results of the run
+def run(level, steps, controls):
+    level.controls = controls
+    level.done = False
+    level.quit = False
+    level.deaths = 0
+    level.startup()
+
+    step_num = 0
+    while step_num < steps and not (level.done or level.quit):
+        for event in controls.next_step():
+            level.get_event(event)
+        level.update()
+        step_num += 1
+
+    return {
+        "completed": level.done or level.quit,
+        "steps": step_num,
+        "deaths": level.deaths,
+        "position": tuple(level.player.rect.topleft),
+    }
+
+# Run a level from the command line
+def main():
+    parser = argparse.ArgumentParser(description="Run a level without a display")
+    parser.add_argument("level", help="name of the level to run, like level_1")
+    parser.add_argument("script", help="input script to play the level with, see inputs.load_script")
+    parser.add_argument("--steps", type=int, default=10000, help="most simulation steps to run")
+    args = parser.parse_args()
+
+    resources.init()
+
+    level = states.Level(args.level)
+    controls = inputs.load_script(args.script)
+
+    start = time.perf_counter()
+    result = run(level, args.steps, controls)
+    elapsed = time.perf_counter() - start
+
+    print("{} after {} steps ({} deaths) in {:.3f} seconds".format(
+        "Completed" if result["completed"] else "Not completed", result["steps"], result["deaths"], elapsed))
+
+if __name__ == "__main__":
+    main()
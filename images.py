@@ -0,0 +1,39 @@
+import pygame
+
+# Every distinct image the sprites use is only created once, converted to the display's pixel format and shared
+# Shared surfaces must never be drawn on, since every sprite using them would change
+registry = {}
+
+# Convert a surface to the display's pixel format so blitting it doesn't have to convert it every time
+# Surfaces can only be converted once the display has been created, which it isn't when running headless
+def convert(surface):
+    if pygame.display.get_surface() is None:
+        return surface
+
+    if surface.get_flags() & pygame.SRCALPHA:
+        return surface.convert_alpha()
+    return surface.convert()
+
+# Get a shared surface of size filled with color
+def solid(size, color):
+    key = ("solid", tuple(size), tuple(color))
+
+    if key not in registry:
+        surface = pygame.Surface(size)
+        surface.fill(color)
+        registry[key] = convert(surface)
+
+    return registry[key]
+
+# Get the shared, converted version of an image
+def image(surface):
+    key = ("image", surface)
+
+    if key not in registry:
+        registry[key] = convert(surface)
+
+    return registry[key]
+
+# Forget every shared surface, they are created again the next time they are used
+def clear():
+    registry.clear()
@@ -0,0 +1,92 @@
+import pygame
+
+# Keys held down during a simulation step, can be indexed like the result of pygame.key.get_pressed()
+class Key_State:
+    # Initialize the key state class
+    def __init__(self, pressed=()):
+        self.pressed = frozenset(pressed)
+
+    def __getitem__(self, key):
+        return key in self.pressed
+
+# Input from the real keyboard
+class Keyboard_Input:
+    # Move on to the next simulation step, events are the events from the event queue for this step
+    def next_step(self, events=()):
+        return events
+
+    # Get the keys that are held down right now
+    def get_pressed(self):
+        return pygame.key.get_pressed()
+
+    # The keyboard never runs out of input
+    def finished(self):
+        return False
+
+# Input read from a script instead of the keyboard and event queue, used to run levels without a display
+# Steps is a list of (held keys, events) pairs, one for every simulation step
+class Scripted_Input:
+    # Initialize the scripted input class
+    def __init__(self, steps):
+        self.steps = steps
+        self.step_num = -1
+        self.keys = Key_State()
+
+    # Move on to the next simulation step and return the events that happen during it
+    # Events from the event queue are ignored, the events come from the script instead
+    # When the script runs out, no keys are held and no events happen
+    def next_step(self, events=()):
+        self.step_num += 1
+
+        if self.step_num >= len(self.steps):
+            self.keys = Key_State()
+            return []
+
+        keys, events = self.steps[self.step_num]
+        self.keys = Key_State(keys)
+        return events
+
+    # Get the keys held down during the current step
+    def get_pressed(self):
+        return self.keys
+
+    # Test if the script has run out of steps
+    def finished(self):
+        return self.step_num >= len(self.steps) - 1
+
+# Shared keyboard input, used by default by everything that reads keys
+keyboard = Keyboard_Input()
+
+# Get the key code of a key name like "a", "space" or "return"
+def key_code(name):
+    return pygame.key.key_code(name)
+
+# Load a script file, every line is a number of steps followed by what happens during them, for example:
+#   30 d space !space
+#   10 a !click:400,300
+# Plain key names are held down for all of the steps, names starting with ! are events that happen on the first step
+# (!<key> is a key press and !click:x,y is a mouse click at x, y on the screen). Lines starting with # are ignored
+def load_script(path):
+    steps = []
+
+    with open(path) as script:
+        for line in script:
+            tokens = line.split()
+            if not tokens or tokens[0].startswith("#"):
+                continue
+
+            keys = set()
+            events = []
+            for token in tokens[1:]:
+                if token.startswith("!click:"):
+                    x, y = token[len("!click:"):].split(",")
+                    events.append(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(int(x), int(y)), button=1))
+                elif token.startswith("!"):
+                    events.append(pygame.event.Event(pygame.KEYDOWN, key=key_code(token[1:])))
+                else:
+                    keys.add(key_code(token))
+
+            steps.append((keys, events))
+            steps.extend((keys, []) for step in range(int(tokens[0]) - 1))
+
+    return Scripted_Input(steps)
@@ -0,0 +1,165 @@
+import mmap
+import os
+import re
+import struct
+import threading
+from array import array
+
+import settings
+
+# Tile ids, every cell of a level is one of these
+EMPTY = 0
+WALL = 1
+EXIT = 2
+DOOR = 3
+GENERATOR = 4
+
+# Level source files are rows of whitespace separated tokens, the same tokens the old level lists used:
+# 0 is empty, 1 is a wall, -1 is an exit, d<id> is a door and g<id> is a generator powering the doors with the same id
+# Lines starting with ; are comments
+simple_tokens = {"0": EMPTY, "1": WALL, "-1": EXIT}
+entity_tokens = {"d": DOOR, "g": GENERATOR}
+
+# Compiled levels start with the magic bytes, the file version, the level size, the entity count
+# and the size and modification time of the source file they were compiled from (used to tell if they are outdated)
+MAGIC = b"TIPL"
+VERSION = 1
+HEADER = struct.Struct("<4sBHHIQQ")
+
+# After the header come width * height tile ids, one byte each, then the entity table
+# Every entity is its tile id, column, row and door/generator id
+ENTITY = struct.Struct("<BHHH")
+
+# Compiled level data, the tile ids and the doors and generators of a level
+class Level_Data:
+    # Initialize the level data class
+    # Tiles is a bytes-like object of width * height tile ids, entities is a list of (tile id, col, row, id)
+    def __init__(self, width, height, tiles, entities):
+        self.width = width
+        self.height = height
+        self.tiles = tiles
+        self.entities = entities
+
+        # Merged wall rectangles and exit cells of every chunk, auto-tiled wall pieces and the wall rows of every column,
+        # filled in by Level.plan_level the first time the level is built
+        self.chunk_walls = None
+        self.chunk_exits = None
+        self.wall_pieces = None
+        self.column_walls = None
+
+    # Get the tile id at col, row
+    def tile(self, col, row):
+        return self.tiles[row * self.width + col]
+
+    # Get the level as rows of tokens, like the old level lists
+    def to_rows(self):
+        rows = [[[0, 1, -1, 0, 0][self.tile(col, row)] for col in range(self.width)] for row in range(self.height)]
+        for tile_id, col, row, id in self.entities:
+            rows[row][col] = ("d" if tile_id == DOOR else "g") + str(id)
+        return rows
+
+    # Create level data from rows of tokens
+    @classmethod
+    def from_rows(cls, rows):
+        width = len(rows[0])
+        tiles = array("B", bytes(width * len(rows)))
+        entities = []
+
+        for row_num, row in enumerate(rows):
+            if len(row) != width:
+                raise ValueError("Row {} is {} tiles wide instead of {}".format(row_num + 1, len(row), width))
+
+            for col_num, token in enumerate(row):
+                token = str(token)
+                if token in simple_tokens:
+                    tiles[row_num * width + col_num] = simple_tokens[token]
+                elif token[:1] in entity_tokens and token[1:].isdigit():
+                    tiles[row_num * width + col_num] = entity_tokens[token[0]]
+                    entities.append((entity_tokens[token[0]], col_num, row_num, int(token[1:])))
+                else:
+                    raise ValueError("Unknown tile {!r} at row {}, column {}".format(token, row_num + 1, col_num + 1))
+
+        return cls(width, len(rows), tiles, entities)
+
+# Parse the text of a level source file
+def parse(source):
+    rows = [line.split() for line in source.splitlines()]
+    return Level_Data.from_rows([row for row in rows if row and not row[0].startswith(";")])
+
+# Get the paths of a level's source file and compiled file
+def source_path(name):
+    return os.path.join(settings.level_dir, name + ".txt")
+
+def compiled_path(name):
+    return os.path.join(settings.level_cache_dir, name + ".lvl")
+
+# Get the names of all levels, in order (level_2 comes before level_10)
+def level_names():
+    names = [file_name[:-len(".txt")] for file_name in os.listdir(settings.level_dir) if file_name.endswith(".txt")]
+    return sorted(names, key=lambda name: [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", name)])
+
+# Compile a level source file to the binary level format
+def compile_level(source, destination):
+    with open(source) as source_file:
+        level = parse(source_file.read())
+    stat = os.stat(source)
+
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+
+    # Write to a temporary file first, so a level that is being loaded never sees a half written file
+    with open(destination + ".tmp", "wb") as compiled_file:
+        compiled_file.write(HEADER.pack(MAGIC, VERSION, level.width, level.height, len(level.entities), stat.st_size, stat.st_mtime_ns))
+        compiled_file.write(bytes(level.tiles))
+        for entity in level.entities:
+            compiled_file.write(ENTITY.pack(*entity))
+    os.replace(destination + ".tmp", destination)
+
+# Memory-map a compiled level file, returns None if it doesn't exist or is outdated
+def map_compiled(path, source_stat):
+    try:
+        with open(path, "rb") as compiled_file:
+            data = mmap.mmap(compiled_file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    if len(data) < HEADER.size:
+        return None
+
+    magic, version, width, height, entity_count, source_size, source_mtime = HEADER.unpack_from(data, 0)
+    if (magic != MAGIC or version != VERSION or len(data) != HEADER.size + width * height + entity_count * ENTITY.size
+            or (source_stat is not None and (source_size, source_mtime) != (source_stat.st_size, source_stat.st_mtime_ns))):
+        data.close()
+        return None
+
+    tiles = memoryview(data)[HEADER.size:HEADER.size + width * height]
+    entities = [entity for entity in ENTITY.iter_unpack(data[HEADER.size + width * height:])]
+    return Level_Data(width, height, tiles, entities)
+
+# Levels that have already been loaded, so restarting a level doesn't load it again
+loaded = {}
+
+# Levels are loaded by the preloader thread as well as the main thread
+load_lock = threading.Lock()
+
+# Load a level by name, compiling its source file first if the compiled file is missing or outdated
+def load(name):
+    with load_lock:
+        return load_unlocked(name)
+
+def load_unlocked(name):
+    if name in loaded:
+        return loaded[name]
+
+    source = source_path(name)
+    compiled = compiled_path(name)
+    source_stat = os.stat(source) if os.path.exists(source) else None
+
+    level = map_compiled(compiled, source_stat)
+    if level is None:
+        if source_stat is None:
+            raise FileNotFoundError("No level called {} in {}".format(name, settings.level_dir))
+        compile_level(source, compiled)
+        level = map_compiled(compiled, None)
+
+    loaded[name] = level
+    return level
@@ -1,3 +1,9 @@
+# Taken before anything else is imported, so the startup timings include importing pygame
+import time
+process_start = time.perf_counter()
+
+import argparse
+import asyncio
 import random
 
 import pygame
@@ -6,23 +12,62 @@ import settings
 import sprites
 #import tiles/
 import states
+import inputs
+import replay
+import preload
+import resources
+from profiling import profiler
+from tasks import scheduler
 
 # Control classw
 class Control:
     # Initialize the control class
-    def __init__(self):
-        pygame.init()
+    # Controls is where the input comes from, time scale makes the simulation run faster than real time (used for replays)
+    def __init__(self, controls=inputs.keyboard, time_scale=1):
+        resources.init()
         self.running = True
-        self.playing = True
         self.game_display = pygame.display.set_mode((settings.display_width, settings.display_height))
         self.clock = pygame.time.Clock()
 
+        # Fixed timestep variables
+        # The simulation always advances in steps of step_time, no matter how fast the frames are drawn
+        self.step_time = 1000 / settings.tick_rate
+
+        self.time_scale = time_scale
+
+        self.controls = controls
+
+        # Prepares the next state on a worker thread while the current one is running
+        self.preloader = preload.Preloader()
+
+        # When the frame rate was last shown in the window caption
+        self.caption_time = -settings.caption_interval
+
+        self.new_session()
+
+    # Reset the variables of a single play session, used every time the game starts over
+    def new_session(self):
+        self.playing = True
+        self.accumulator = 0
+
+        # Events are queued up and handed to the state at the start of the next simulation step
+        self.pending_events = []
+
     # Setup the state control
     def setup_states(self, state_dict, start_state):
         self.state_dict = state_dict
         self.state_name = start_state
         self.state = self.state_dict[self.state_name]
 
+        # Every state reads its input from the same controls
+        for state in self.state_dict.values():
+            state.controls = self.controls
+
+        # The start state can be left over from the last session, so it starts again and draws the whole display
+        self.state.startup()
+
+        self.preloader.request(self.state_dict.get(self.state.next))
+
     # Function that runs when switching state
     def switch_state(self):
         self.state.done = False
@@ -30,17 +75,80 @@ class Control:
 
         self.state.cleanup()
         self.state = self.state_dict[self.state_name]
+
+        # The state is usually prepared by now, if it isn't this waits for it
+        self.preloader.finish(self.state)
         self.state.startup()
 
         self.state.previous = previous
 
-    # Game loop
+        # Start preparing the state after this one
+        self.preloader.request(self.state_dict.get(self.state.next))
+
+    # Game loop, clock.tick sleeps until the next frame is due
     def loop(self):
         while self.playing:
-            self.clock.tick(settings.FPS)
+            self.frame(self.clock.tick(settings.FPS))
+
+            # Run the background tasks of the states
+            scheduler.step()
+
+    # Asyncio game loop, waiting for the next frame is an awaited sleep so background tasks run in between frames
+    async def loop_async(self):
+        frame_time = 1 / settings.FPS
+        next_frame = time.perf_counter()
+
+        while self.playing:
+            self.frame(self.clock.tick())
+
+            # If a frame took too long, the next one starts right away instead of trying to catch up with shorter frames
+            next_frame = max(next_frame + frame_time, time.perf_counter())
+            await scheduler.sleep_until(next_frame)
+
+    # Run one frame, elapsed is the milliseconds since the last frame
+    def frame(self, elapsed):
+        self.accumulator += elapsed * self.time_scale
+        profiler.begin_frame()
+
+        with profiler.span("events"):
             self.events()
-            self.update()
-            pygame.display.update()
+
+        # Run as many simulation steps as the time since the last frame covers
+        # If the game falls too far behind, drop the time it can't catch up on instead of slowing down even more
+        steps = 0
+        while self.accumulator >= self.step_time and self.playing:
+            if steps == settings.max_frame_steps * self.time_scale:
+                self.accumulator = 0
+                break
+            with profiler.span("update"):
+                self.update()
+            self.accumulator -= self.step_time
+            steps += 1
+
+        # Draw the state in between the last two simulation steps
+        with profiler.span("draw"):
+            dirty_rects = self.draw(self.accumulator / self.step_time)
+
+            if profiler.show_overlay:
+                overlay_rect = profiler.draw(self.game_display)
+                if dirty_rects is not None:
+                    dirty_rects.append(overlay_rect)
+
+        # States return the rects they changed, or None when the whole display changed
+        with profiler.span("flip"):
+            if dirty_rects is None:
+                pygame.display.update()
+            elif dirty_rects:
+                pygame.display.update(dirty_rects)
+
+        # Finish building any state the preloader has prepared
+        self.preloader.poll()
+
+        profiler.end_frame()
+
+        # Only update the caption once in a while, setting it is slow on some systems
+        if pygame.time.get_ticks() - self.caption_time >= settings.caption_interval:
+            self.caption_time = pygame.time.get_ticks()
             pygame.display.set_caption(settings.title + " running at " + str(int(self.clock.get_fps())) + " frames per second")
 
     # Event handling
@@ -49,39 +157,132 @@ class Control:
             if event.type == pygame.QUIT:
                 self.playing = False
                 self.running = False
-            self.state.get_event(event)
 
-    # Update the control class
+            # F3 toggles the profiler overlay, the whole state is drawn again after hiding it so it doesn't leave anything behind
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                profiler.toggle_overlay()
+                if not profiler.show_overlay:
+                    self.state.force_redraw()
+                continue
+
+            self.pending_events.append(event)
+
+    # Run one simulation step of the control class
     def update(self):
             if self.state.quit:
                 self.playing = False
             elif self.state.done:
                 self.switch_state()
-            self.state.update(self.game_display)
+
+            # A replay stops the game once it runs out of input
+            if self.controls.finished():
+                self.playing = False
+                self.running = False
+                return
+
+            for event in self.controls.next_step(self.pending_events):
+                if event.type == pygame.QUIT:
+                    self.playing = False
+                    self.running = False
+                self.state.get_event(event)
+            self.pending_events = []
+
+            self.state.update()
+
+    # Draw the current state, alpha is how far the frame is between the last two simulation steps
+    # Returns the rects of the display that changed
+    def draw(self, alpha):
+        return self.state.draw(self.game_display, alpha)
 
 # Randomizing the level order function
+# The last level goes back to the menu and ends the session
 def randomize_level_order(my_dict):
-    for level_num in range(1, len(states.level_list)+1):
+    total = len(states.level_list)
+    for level_num in range(1, total+1):
         my_dict["level_{}".format(level_num)] = states.level_list[random.randrange(0, len(states.level_list))]
         states.level_list.remove(my_dict["level_{}".format(level_num)])
-        if level_num <= len(states.level_list)+1:
+        if level_num < total:
             my_dict["level_{}".format(level_num)].next = "level_{}".format(level_num + 1)
         else:
             my_dict["level_{}".format(level_num)].next = "menu"
             my_dict["level_{}".format(level_num)].quit_on_exit = True
 
-game = Control()
-state_dict = {
-    "menu": states.Menu()
-}
+parser = argparse.ArgumentParser(description=settings.title)
+parser.add_argument("--record", metavar="PATH", help="record the input of the session to a replay file")
+parser.add_argument("--replay", metavar="PATH", help="play back a replay file instead of reading the keyboard")
+parser.add_argument("--speed", type=int, default=1, help="how many times faster than real time a replay runs")
+parser.add_argument("--profile", action="store_true", help="show the profiler overlay from the start (toggle it with F3)")
+parser.add_argument("--profile-dump", metavar="PATH", help="write the frame timings of the session to a csv file")
+parser.add_argument("--startup-times", action="store_true", help="print how long every step of starting the game took")
+parser.add_argument("--async", dest="async_loop", action="store_true", help="run the game loop on asyncio, so background tasks run in between frames")
+args = parser.parse_args()
+
+profiler.show_overlay = args.profile
+profiler.recording = args.profile_dump is not None
+
+# The level order is the only thing the game randomizes, so seeding it once makes a session reproducible
+recorder = None
+time_scale = 1
+if args.replay:
+    seed, tick_rate, controls = replay.load(args.replay)
+
+    # The movement variables are per simulation step, so a replay only plays back the same at the tick rate it was recorded at
+    if tick_rate != settings.tick_rate:
+        parser.error("{} was recorded at {} steps per second, the game runs at {}".format(args.replay, tick_rate, settings.tick_rate))
+    time_scale = args.speed
+else:
+    seed = random.randrange(2 ** 32)
+    controls = inputs.keyboard
+    if args.record:
+        recorder = replay.Recorder(args.record, seed, settings.tick_rate)
+        controls = replay.Recording_Input(recorder)
+random.seed(seed)
+
+# Startup sequence, every step is timed and nothing is loaded before it is needed
+profiler.report_startup = args.startup_times
+profiler.start_process(process_start)
 
-while game.running:
-    game.__init__()
-    states.level_list = states.setup_list()
+with profiler.startup_step("display"):
+    game = Control(controls, time_scale)
+
+with profiler.startup_step("menu"):
+    state_dict = {
+        "menu": states.Menu()
+    }
+
+# Start a new play session
+def start_session():
+    game.new_session()
+
+    # Levels are only listed here, they are built in the background once they are next up
+    with profiler.startup_step("level list"):
+        states.level_list = states.setup_list()
 
     randomize_level_order(state_dict)
     game.setup_states(state_dict, "menu")
-    game.loop()
+
+# Play sessions on the asyncio game loop, every session runs on the same event loop so background tasks carry over
+async def play_async():
+    while game.running:
+        start_session()
+        await game.loop_async()
+
+try:
+    if args.async_loop:
+        asyncio.run(play_async())
+    else:
+        while game.running:
+            start_session()
+            game.loop()
+finally:
+    game.preloader.shutdown()
+
+    # Background writes of the replay finish before the recorder closes its file
+    scheduler.shutdown()
+    if recorder is not None:
+        recorder.close()
+    if args.profile_dump:
+        profiler.dump(args.profile_dump)
 
 pygame.quit()
 quit()
@@ -0,0 +1,166 @@
+import settings
+import levels
+
+# The batched physics needs numpy, without it everything keeps using the per-sprite movement in sprites.py
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Grid of which tiles of a level are solid, one boolean per tile
+# Columns outside the level are solid (like the level borders), rows above and below it are empty
+class Occupancy_Grid:
+    # Initialize the occupancy grid class, level_y is where the top row of the level is on the screen
+    def __init__(self, level, level_y, tile_size=32):
+        self.width = level.width
+        self.height = level.height
+        self.level_y = level_y
+        self.tile_size = tile_size
+
+        # The walls never change, doors are blocked and unblocked on top of them
+        self.walls = numpy.frombuffer(bytes(level.tiles), dtype=numpy.uint8).reshape(level.height, level.width) == levels.WALL
+        self.solid = self.walls.copy()
+
+    # Get the range of columns and rows a rect overlaps, clipped to the level
+    def cell_range(self, rect):
+        first_col = max(0, rect.left // self.tile_size)
+        last_col = min(self.width, (rect.right - 1) // self.tile_size + 1)
+        first_row = max(0, (rect.top - self.level_y) // self.tile_size)
+        last_row = min(self.height, (rect.bottom - 1 - self.level_y) // self.tile_size + 1)
+        return slice(first_row, last_row), slice(first_col, last_col)
+
+    # Make the tiles a rect overlaps solid, used for closed doors
+    def block(self, rect):
+        self.solid[self.cell_range(rect)] = True
+
+    # Make the tiles a rect overlaps go back to what the level has there, used once a door has opened
+    def unblock(self, rect):
+        rows, cols = self.cell_range(rect)
+        self.solid[rows, cols] = self.walls[rows, cols]
+
+    # Unblock every tile, so only the walls of the level are solid again
+    def reset(self):
+        self.solid[:] = self.walls
+
+    # Test if points are inside solid tiles, xs and ys are arrays of screen positions
+    def solid_at(self, xs, ys):
+        cols = xs // self.tile_size
+        rows = (ys - self.level_y) // self.tile_size
+
+        inside_cols = (cols >= 0) & (cols < self.width)
+        inside_rows = (rows >= 0) & (rows < self.height)
+        cells = self.solid[numpy.clip(rows, 0, self.height - 1), numpy.clip(cols, 0, self.width - 1)]
+
+        return numpy.where(inside_cols, cells & inside_rows, True)
+
+    # Test if a rect overlaps any solid tile
+    def collide(self, rect):
+        if rect.left < 0 or rect.right > self.width * self.tile_size:
+            return True
+        return bool(self.solid[self.cell_range(rect)].any())
+
+# Positions, sizes, velocities and collision results of many bodies, stored in numpy arrays
+# Every simulation step moves all of the bodies at once: gravity, velocity clamping, then X and Y movement with collision
+# Positions are whole pixels and are rounded the same way pygame rects round, so a body moves exactly like a sprite would
+class Body_Array:
+    # Initialize the body array class, grid is the occupancy grid the bodies collide with
+    def __init__(self, grid, capacity=16):
+        self.grid = grid
+        self.count = 0
+
+        # Indexes of removed bodies that can be used again
+        self.free = []
+
+        self.x = numpy.zeros(capacity, dtype=numpy.int64)
+        self.y = numpy.zeros(capacity, dtype=numpy.int64)
+        self.w = numpy.zeros(capacity, dtype=numpy.int64)
+        self.h = numpy.zeros(capacity, dtype=numpy.int64)
+        self.x_velocity = numpy.zeros(capacity)
+        self.y_velocity = numpy.zeros(capacity)
+        self.x_top_speed = numpy.zeros(capacity)
+        self.y_top_speed = numpy.zeros(capacity)
+        self.gravity = numpy.zeros(capacity)
+        self.active = numpy.zeros(capacity, dtype=bool)
+
+        # Which way each body hit a tile during the last step on each axis, -1, 0 or 1
+        self.hit_x = numpy.zeros(capacity, dtype=numpy.int8)
+        self.hit_y = numpy.zeros(capacity, dtype=numpy.int8)
+
+    # Make room for more bodies by doubling the size of every array
+    def grow(self):
+        for name in ("x", "y", "w", "h", "x_velocity", "y_velocity", "x_top_speed", "y_top_speed", "gravity", "active", "hit_x", "hit_y"):
+            array = getattr(self, name)
+            setattr(self, name, numpy.concatenate((array, numpy.zeros_like(array))))
+
+    # Add a body with the position and size of rect, returns its index
+    def add(self, rect, x_top_speed, y_top_speed, gravity=settings.player_grav):
+        if self.free:
+            index = self.free.pop()
+        else:
+            if self.count == len(self.x):
+                self.grow()
+            index = self.count
+            self.count += 1
+
+        self.w[index], self.h[index] = rect.size
+        self.x_top_speed[index] = x_top_speed
+        self.y_top_speed[index] = y_top_speed
+        self.gravity[index] = gravity
+        self.active[index] = True
+        self.set(index, rect, 0, 0)
+        return index
+
+    # Remove a body, its index is used again by the next body that is added
+    def remove(self, index):
+        self.active[index] = False
+        self.hit_x[index] = self.hit_y[index] = 0
+        self.free.append(index)
+
+    # Set the position and velocity of a body
+    def set(self, index, rect, x_velocity, y_velocity):
+        self.x[index], self.y[index] = rect.topleft
+        self.x_velocity[index] = x_velocity
+        self.y_velocity[index] = y_velocity
+
+    # Get points spread along an edge of every body, no further apart than a tile so no tile can slip in between
+    # Starts is where the edge starts and lengths how long it is, returns a (bodies, points) array
+    def edge_points(self, starts, lengths):
+        points = int(lengths.max(initial=1)) // self.grid.tile_size + 2
+        offsets = numpy.arange(points) * self.grid.tile_size
+        return starts[:, None] + numpy.minimum(offsets[None, :], lengths[:, None] - 1)
+
+    # Run one simulation step for every body
+    def step(self):
+        n = self.count
+        tile_size = self.grid.tile_size
+        active = self.active[:n]
+        x, y, w, h = self.x[:n], self.y[:n], self.w[:n], self.h[:n]
+        x_velocity, y_velocity = self.x_velocity[:n], self.y_velocity[:n]
+
+        # Clamp the X velocity to the top speed, and speed up the fall until the Y top speed is reached
+        numpy.clip(x_velocity, -self.x_top_speed[:n], self.x_top_speed[:n], out=x_velocity)
+        falling = active & (y_velocity < self.y_top_speed[:n])
+        y_velocity[falling] = numpy.minimum(y_velocity[falling] + self.gravity[:n][falling], self.y_top_speed[:n][falling])
+
+        # X-Axis movement, only the leading edge can have moved into a tile
+        moving = active & (x_velocity != 0)
+        x[moving] += numpy.floor(x_velocity[moving] + 0.5).astype(numpy.int64)
+
+        edge_x = numpy.where(x_velocity > 0, x + w - 1, x)
+        hits = moving & self.grid.solid_at(edge_x[:, None], self.edge_points(y, h)).any(axis=1)
+        cols = edge_x // tile_size
+        x[:] = numpy.where(hits & (x_velocity > 0), cols * tile_size - w, numpy.where(hits & (x_velocity < 0), (cols + 1) * tile_size, x))
+        self.hit_x[:n] = numpy.where(hits, numpy.sign(x_velocity), 0)
+        x_velocity[hits] = 0
+
+        # Y-Axis movement
+        moving = active & (y_velocity != 0)
+        y[moving] += numpy.floor(y_velocity[moving] + 0.5).astype(numpy.int64)
+
+        edge_y = numpy.where(y_velocity > 0, y + h - 1, y)
+        hits = moving & self.grid.solid_at(self.edge_points(x, w), edge_y[:, None]).any(axis=1)
+        rows = (edge_y - self.grid.level_y) // tile_size
+        tile_y = self.grid.level_y + rows * tile_size
+        y[:] = numpy.where(hits & (y_velocity > 0), tile_y - h, numpy.where(hits & (y_velocity < 0), tile_y + tile_size, y))
+        self.hit_y[:n] = numpy.where(hits, numpy.sign(y_velocity), 0)
+        y_velocity[hits] = 0
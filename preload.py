@@ -0,0 +1,36 @@
+from concurrent.futures import ThreadPoolExecutor
+
+# Prepares levels on a worker thread before they are needed, so switching to them doesn't hitch
+# Loading and planning a level happens on the worker thread, only creating its sprites and surfaces happens on the main thread
+class Preloader:
+    # Initialize the preloader class
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="preloader")
+
+        # States that are being prepared, and the futures of their level data
+        self.pending = {}
+
+    # Start preparing a state on the worker thread, states that can't be prepared or are already built are ignored
+    def request(self, state):
+        if state is None or not hasattr(state, "prepare") or state.built() or state in self.pending:
+            return
+
+        self.pending[state] = self.executor.submit(state.prepare)
+
+    # Build the states that have finished preparing, this has to run on the main thread
+    def poll(self):
+        for state, future in list(self.pending.items()):
+            if future.done():
+                del self.pending[state]
+                state.build(future.result())
+
+    # Wait for a state that is being prepared and build it
+    def finish(self, state):
+        future = self.pending.pop(state, None)
+        if future is not None:
+            state.build(future.result())
+
+    # Stop the worker thread
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+        self.pending = {}
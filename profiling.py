@@ -0,0 +1,157 @@
+import time
+from collections import deque
+
+import pygame
+
+import settings
+import text
+
+# Collects named timing spans for every frame, and can show them in an overlay or write them to a file
+class Profiler:
+    # Initialize the profiler class
+    def __init__(self, history=settings.profiler_history):
+        # Span names in the order they are shown
+        self.names = ["events", "update", "physics", "draw", "flip"]
+
+        # Rolling history of the last frames, every frame is a dict of span name to milliseconds plus the frame total
+        self.frames = deque(maxlen=history)
+        self.current = {}
+        self.frame_start = None
+
+        # Every frame is also kept here while recording, so it can be written to a file
+        self.recording = False
+        self.samples = []
+
+        # Startup sequence timings, a list of (step name, milliseconds)
+        self.startup_times = []
+        self.process_start = time.perf_counter()
+        self.first_frame = None # Milliseconds from the start of the process to the end of the first frame
+        self.report_startup = False # Print the startup timings after the first frame
+
+        # Overlay variables, the overlay surface is created the first time it is drawn
+        self.show_overlay = False
+        self.overlay = None
+
+    # Start timing a new frame
+    def begin_frame(self):
+        self.frame_start = time.perf_counter()
+        self.current = {}
+
+    # Stop timing the current frame and add it to the history
+    def end_frame(self):
+        if self.frame_start is None:
+            return
+
+        self.current["frame"] = (time.perf_counter() - self.frame_start) * 1000
+
+        if self.first_frame is None:
+            self.first_frame = (time.perf_counter() - self.process_start) * 1000
+            if self.report_startup:
+                self.print_startup()
+        self.frames.append(self.current)
+        if self.recording:
+            self.samples.append(self.current)
+
+        self.frame_start = None
+
+    # Add the time since start to the span called name, a span can be timed more than once per frame
+    def add(self, name, start):
+        self.current[name] = self.current.get(name, 0) + (time.perf_counter() - start) * 1000
+        if name not in self.names:
+            self.names.append(name)
+
+    # Time a block of code as the span called name, used as "with profiler.span(name):"
+    def span(self, name):
+        return Span(self, name)
+
+    # Time a step of the startup sequence, used as "with profiler.startup_step(name):"
+    def startup_step(self, name):
+        return Startup_Step(self, name)
+
+    # Start the startup timings at start, a time.perf_counter() time from before this module was imported
+    # Everything up to now (importing pygame and the game modules) becomes the first startup step
+    def start_process(self, start):
+        self.process_start = start
+        self.startup_times.insert(0, ("imports", (time.perf_counter() - start) * 1000))
+
+    # Print how long every step of the startup sequence took
+    def print_startup(self):
+        for name, ms in self.startup_times:
+            print("{:<24} {:8.2f} ms".format(name, ms))
+        print("{:<24} {:8.2f} ms".format("time to first frame", self.first_frame))
+
+    # Toggle the overlay on and off
+    def toggle_overlay(self):
+        self.show_overlay = not self.show_overlay
+
+    # Get the average time of a span over the frames in the history
+    def average(self, name):
+        if not self.frames:
+            return 0
+        return sum(frame.get(name, 0) for frame in self.frames) / len(self.frames)
+
+    # Draw the overlay to the screen, returns the rect it was drawn to
+    def draw(self, screen):
+        overlay_height = settings.profiler_graph_height + 4 + 16 * (len(self.names) + 1)
+        if self.overlay is None or self.overlay.get_height() != overlay_height:
+            self.overlay = pygame.Surface((settings.profiler_width, overlay_height))
+
+        self.overlay.fill(settings.black)
+
+        # Frame time graph, the line is the time one simulation step takes
+        graph_height = settings.profiler_graph_height
+        budget = 1000 / settings.tick_rate
+        scale = graph_height / (budget * 2)
+        bar_width = settings.profiler_width / self.frames.maxlen
+
+        for frame_num, frame in enumerate(self.frames):
+            bar_height = min(graph_height, frame["frame"] * scale)
+            color = settings.red if frame["frame"] > budget else settings.green
+            pygame.draw.rect(self.overlay, color, (frame_num * bar_width, graph_height - bar_height, max(1, bar_width), bar_height))
+
+        pygame.draw.line(self.overlay, settings.white, (0, graph_height - budget * scale), (settings.profiler_width, graph_height - budget * scale))
+
+        # Per subsystem breakdown, rounded so the rendered text can be cached
+        lines = ["frame {:.1f} ms".format(self.average("frame"))]
+        lines += ["{} {:.1f} ms".format(name, self.average(name)) for name in self.names]
+        for line_num, line in enumerate(lines):
+            self.overlay.blit(text.render(line, settings.white, 16), (4, graph_height + 2 + line_num * 16))
+
+        return screen.blit(self.overlay, (4, 4))
+
+    # Write the recorded frames to a csv file
+    def dump(self, path):
+        with open(path, "w") as dump_file:
+            dump_file.write(",".join(["frame_num", "frame"] + self.names) + "\n")
+            for frame_num, frame in enumerate(self.samples):
+                values = [frame.get(name, 0) for name in ["frame"] + self.names]
+                dump_file.write(",".join([str(frame_num)] + ["{:.4f}".format(value) for value in values]) + "\n")
+
+# A timing span, adds its time to the profiler when the with block ends
+class Span:
+    # Initialize the span class
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.profiler.add(self.name, self.start)
+
+# A step of the startup sequence, adds its time to the profiler's startup timings when the with block ends
+class Startup_Step:
+    # Initialize the startup step class
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.profiler.startup_times.append((self.name, (time.perf_counter() - self.start) * 1000))
+
+# Shared profiler, used by the control class and the states
+profiler = Profiler()
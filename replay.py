@@ -0,0 +1,161 @@
+import struct
+
+import pygame
+
+import inputs
+from tasks import scheduler
+
+# Replay files start with the magic bytes, the file version, the random seed and the tick rate it was recorded at
+MAGIC = b"TIPR"
+VERSION = 1
+HEADER = struct.Struct("<4sBIH")
+
+# Every record is a run of simulation steps with the same held keys: step count, held keys bitmask, event count
+# The events of a record all happen on the first step of the run
+RECORD = struct.Struct("<HBB")
+
+# Event types and what is stored after them
+KEYDOWN = 1 # Key code
+MOUSEBUTTONDOWN = 2 # Mouse x, mouse y, button
+QUIT = 3
+KEY_EVENT = struct.Struct("<I")
+MOUSE_EVENT = struct.Struct("<hhB")
+
+# The keys that are held down during play, each of them is a bit in the held keys bitmask
+recorded_keys = [pygame.K_a, pygame.K_d, pygame.K_SPACE, pygame.K_w, pygame.K_s, pygame.K_RETURN]
+
+# Writes the input of every simulation step to a compact binary replay file
+class Recorder:
+    # Initialize the recorder class
+    def __init__(self, path, seed, tick_rate):
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, seed, tick_rate))
+
+        # Records waiting to be written, they are written on a worker thread so writing doesn't stall a frame
+        self.buffer = []
+        self.writing = False
+
+        # The run of steps that hasn't been written yet
+        self.run_count = 0
+        self.run_keys = 0
+        self.run_events = b""
+        self.run_event_count = 0
+
+    # Record the held keys and events of one simulation step
+    def record_step(self, keys, events):
+        mask = 0
+        for bit, key in enumerate(recorded_keys):
+            if keys[key]:
+                mask |= 1 << bit
+
+        events = [encoded for encoded in (encode_event(event) for event in events) if encoded is not None]
+
+        # Steps without events and with the same keys just make the current run longer
+        if self.run_count and not events and mask == self.run_keys and self.run_count < 0xFFFF:
+            self.run_count += 1
+            return
+
+        self.write_run()
+        self.run_count = 1
+        self.run_keys = mask
+        self.run_events = b"".join(events)
+        self.run_event_count = len(events)
+
+    # Add the current run of steps to the records waiting to be written
+    def end_run(self):
+        if self.run_count:
+            self.buffer.append(RECORD.pack(self.run_count, self.run_keys, self.run_event_count) + self.run_events)
+
+    # Write the current run of steps to the file
+    def write_run(self):
+        self.end_run()
+        if self.buffer and not self.writing:
+            self.writing = True
+            scheduler.spawn(self.write_buffer())
+
+    # Write the buffered records on a worker thread, only one of these runs at a time so the records stay in order
+    async def write_buffer(self):
+        try:
+            while self.buffer:
+                data = b"".join(self.buffer)
+                self.buffer = []
+                await scheduler.run_blocking(self.file.write, data)
+        finally:
+            self.writing = False
+
+    # Write what is left and close the file
+    # The scheduler has to be shut down first, so a write that was already started has finished
+    def close(self):
+        self.end_run()
+        self.run_count = 0
+        self.file.write(b"".join(self.buffer))
+        self.buffer = []
+        self.file.close()
+
+# Input from the keyboard that is recorded while playing
+class Recording_Input(inputs.Keyboard_Input):
+    # Initialize the recording input class
+    def __init__(self, recorder):
+        self.recorder = recorder
+        self.keys = inputs.Key_State()
+
+    # Move on to the next simulation step, the held keys are read once per step so the replay sees exactly the same keys
+    def next_step(self, events=()):
+        pressed = pygame.key.get_pressed()
+        self.keys = inputs.Key_State(key for key in recorded_keys if pressed[key])
+
+        self.recorder.record_step(self.keys, events)
+        return events
+
+    # Get the keys held down during the current step
+    def get_pressed(self):
+        return self.keys
+
+# Get the bytes for an event, returns None for events the game doesn't use
+def encode_event(event):
+    if event.type == pygame.KEYDOWN:
+        return bytes([KEYDOWN]) + KEY_EVENT.pack(event.key)
+    if event.type == pygame.MOUSEBUTTONDOWN:
+        return bytes([MOUSEBUTTONDOWN]) + MOUSE_EVENT.pack(event.pos[0], event.pos[1], event.button)
+    if event.type == pygame.QUIT:
+        return bytes([QUIT])
+    return None
+
+# Load a replay file, returns the random seed, the tick rate and a Scripted_Input that plays the recording back
+def load(path):
+    with open(path, "rb") as replay_file:
+        data = replay_file.read()
+
+    magic, version, seed, tick_rate = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("{} is not a version {} replay file".format(path, VERSION))
+
+    steps = []
+    offset = HEADER.size
+    while offset < len(data):
+        count, mask, event_count = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+
+        events = []
+        for event_num in range(event_count):
+            event_type = data[offset]
+            offset += 1
+
+            if event_type == KEYDOWN:
+                key, = KEY_EVENT.unpack_from(data, offset)
+                offset += KEY_EVENT.size
+                events.append(pygame.event.Event(pygame.KEYDOWN, key=key))
+            elif event_type == MOUSEBUTTONDOWN:
+                x, y, button = MOUSE_EVENT.unpack_from(data, offset)
+                offset += MOUSE_EVENT.size
+                events.append(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(x, y), button=button))
+            elif event_type == QUIT:
+                events.append(pygame.event.Event(pygame.QUIT))
+            else:
+                raise ValueError("Unknown event type {} in {}".format(event_type, path))
+
+        keys = [key for bit, key in enumerate(recorded_keys) if mask & (1 << bit)]
+        steps.append((keys, events))
+        steps.extend((keys, []) for step in range(count - 1))
+
+    return seed, tick_rate, inputs.Scripted_Input(steps)
@@ -1,5 +1,14 @@
 import pygame
 
-# Initialize pygame so that sounds can load
-pygame.mixer.pre_init(44100, -16, 1, 512)
-pygame.init()
+# Set when init has run, so pygame is only initialized once
+initialized = False
+
+# Initialize pygame so that sounds and fonts can load
+# Nothing is initialized on import, the game calls this once at the start of its startup sequence
+def init():
+    global initialized
+
+    if not initialized:
+        pygame.mixer.pre_init(44100, -16, 1, 512)
+        pygame.init()
+        initialized = True
@@ -1,6 +1,3 @@
-from pygame import font
-font.init()
-
 # Colors
 white = (255, 255, 255)
 black = (0, 0,  0)
@@ -16,11 +13,48 @@ orange = (255, 100, 0)
 display_width = 800
 display_height = 640
 title = "Platformer"
-FPS = 60
+FPS = 120 # Frames drawn per second at most
+
+# Simulation variables
+tick_rate = 60 # Simulation steps per second, all of the movement variables are per step
+max_frame_steps = 5 # Most simulation steps run in a single frame before the game gives up catching up
+frame_spin_time = 0.002 # Seconds before a frame is due that the asyncio game loop stops sleeping and only yields to its tasks
+task_workers = 2 # Worker threads for the blocking work of background tasks
+
+# Rendering variables
+chunk_width = 16 # Columns in a level chunk, only the chunks near the camera have blocks and surfaces
+chunk_height = 10 # Rows in a level chunk
+chunk_load_distance = 256 # How far outside each side of the screen chunks are materialized
+
+# Profiler variables
+profiler_history = 120 # Frames shown in the frame time graph
+profiler_width = 240
+profiler_graph_height = 60
+caption_interval = 1000 # Milliseconds between updates of the frame rate in the window caption
+
+# Camera variables, on the X and Y axis
+camera_dead_zone = (0, 128) # Size of the box in the middle of the screen the player can move in without the camera following
+camera_follow = (1, 0.25) # How much of the way to the player the camera moves every step, 1 keeps up right away
+
+# Lightning variables
+lightning_life = 21 # Simulation steps a lightning bolt lasts (350 ms)
+max_magic = 8 # Most lightning bolts there can be at once
 
 # Player variables
 player_acc = 1
 player_grav = 0.5
+vector_physics = False # Move the player with the batched numpy physics in physics.py instead of per sprite (needs numpy)
+
+# Level variables
+level_dir = "levels" # Level source files
+level_cache_dir = "levels/cache" # Compiled levels
+
+# Tileset variables
+tileset_dir = "images/tilesets"
+tileset_files = ["grass.png", "details.png", "oak_trees.png", "house_1.png", "platforms.png"] # In tileset number order
+wall_tileset = 0 # Tileset number the walls are drawn with
 
 # Font variables
 font_file = "fonts/8-Bit-Madness.ttf"
+font_cache_size = 8 # Number of (file, size) font objects kept loaded
+text_cache_size = 64 # Number of rendered text surfaces kept
@@ -2,63 +2,109 @@ import pygame
 import random
 
 import settings
+import inputs
+import images
+
+# Get the rect in between last_rect and rect, alpha is how far in between from 0 to 1
+def interpolate(last_rect, rect, alpha):
+    if alpha >= 1 or last_rect.topleft == rect.topleft:
+        return rect.copy()
+
+    return rect.move(round((last_rect.x - rect.x) * (1 - alpha)), round((last_rect.y - rect.y) * (1 - alpha)))
 
 # Lightning class
 class Lightning(pygame.sprite.Sprite):
-    # Initialize the lightning class
-    def __init__(self, x, solid_list, generators):
+    # Initialize the lightning class, the bolt starts at the top of the screen, y is where that is in the level
+    # The bolt reaches the bottom of the screen until the level finds where it stops, see Lightning_Wizard.attack
+    def __init__(self, x, y, generators):
         pygame.sprite.Sprite.__init__(self)
 
-        self.image = pygame.Surface((24, settings.display_height))
-        self.image.fill(settings.red)
+        # Every bolt shares the same screen high surface from the image registry
+        self.image = images.solid((24, settings.display_height), settings.red)
         self.rect = self.image.get_rect()
         self.rect.x = x - self.image.get_width() / 2
+        self.rect.y = y
 
-        # Change height upon collision with walls
-        hits = pygame.sprite.spritecollide(self, solid_list, False)
-        hit_count = 0
-        for change_height in hits:
-            if change_height.rect.top < self.rect.bottom and change_height.rect.top >= 32: # Ignore the top layer tiles
-                self.rect.bottom = change_height.rect.top
+        # The top layer of the screen the bolt was cast on, the bolt is drawn under its tiles like it was drawn under the walls
+        self.top_layer = y + 32
 
-        self.birth = pygame.time.get_ticks()
+        # Simulation steps left before the lightning disappears
+        self.life = settings.lightning_life
 
         self.generators = generators
 
     # Update the lightning class
     def update(self):
-        if pygame.time.get_ticks() - self.birth > 350:
+        # Neither the lightning nor the generators move, so the generators it hits are only powered on its first step
+        if self.life == settings.lightning_life:
+            for x in self.generators:
+                if self.rect.colliderect(x.rect):
+                    x.power()
+
+        self.life -= 1
+        if self.life < 0:
             self.kill()
 
-        hits = pygame.sprite.spritecollide(self, self.generators, False)
-        for x in hits:
-            x.powered = True
+    # Draw the part of the lightning below the top layer, x_offset and y_offset are used to draw it relative to the camera
+    def draw(self, display, x_offset=0, y_offset=0):
+        top = max(self.rect.top, self.top_layer)
+        area = pygame.Rect(0, top - self.rect.top, self.rect.width, max(0, self.rect.bottom - top))
+        return display.blit(self.image, (self.rect.x + x_offset, top + y_offset), area)
 
 # Player class
 class Player(pygame.sprite.Sprite):
     # Initialize the player class
-    def __init__(self, x, y, solid_list):
+    def __init__(self, x, y, solid_list, solid_grid=None, controls=inputs.keyboard, bodies=None):
         pygame.sprite.Sprite.__init__(self)
 
-        self.image = pygame.Surface((32, 64))
-        self.image.fill((settings.blue))
+        self.image = images.solid((32, 64), settings.blue)
         self.image_rect = self.image.get_rect()
-        self.image_rect.center = (-1000, -1000)
         self.rect = self.image_rect.copy()
-        self.rect.x, self.rect.y = (x, y)
+        self.jump_rect = pygame.Rect((0, 0, 51, 35))
+
+        # Where the image was drawn after the previous simulation step, used to interpolate between steps
+        self.last_image_rect = self.image_rect.copy()
+
+        # Where the player starts, and where it goes back to when the level is reset
+        self.start_x, self.start_y = (x, y)
+
+        self.x_top_speed = 6
+        self.y_top_speed = 30
+
+        self.reset()
+
+        # Solid list is the sprite group that contains the walls
+        self.solid_list = solid_list
+
+        # Solid grid is an optional spatial index of the same walls, used to only check nearby walls
+        self.solid_grid = solid_grid
+
+        # Where the held keys are read from, the keyboard or a script
+        self.controls = controls
+
+        # Bodies is an optional physics.Body_Array, when it is given the player moves and collides as one of its bodies
+        # The level then runs begin_movement, the step of the body array and end_movement instead of movement
+        self.bodies = bodies
+        if bodies is not None:
+            self.body = bodies.add(self.rect, self.x_top_speed, self.y_top_speed)
+
+    # Put the player back at its start position and stop all of its movement
+    # The rects are changed in place, so nothing has to be allocated
+    def reset(self):
+        self.image_rect.size = self.image.get_size()
+        self.rect.size = self.image_rect.size
+        self.rect.x, self.rect.y = (self.start_x, self.start_y)
 
         self.moving = False
         self.left_lock = False
         self.right_lock = False
 
         self.acceleration = 0
-        self.x_top_speed = 6
-        self.y_top_speed = 30
         self.x_velocity = 0
         self.y_velocity = 0
 
         self.jumping = False
-        self.jump_rect = pygame.Rect((0, 0, 51, 35))
+        self.jump_rect.topleft = (0, 0)
         self.should_jump = False
 
         self.direction = "right"
@@ -67,8 +113,9 @@ class Player(pygame.sprite.Sprite):
 
         self.in_exit = False
 
-        # Solid list is the sprite group that contains the walls
-        self.solid_list = solid_list
+        # The first step after a reset interpolates from the start position instead of from where the player was before
+        self.place_rects()
+        self.last_image_rect.update(self.image_rect)
 
     # Player class event handling
     def events(self):
@@ -77,7 +124,7 @@ class Player(pygame.sprite.Sprite):
         self.acceleration = 0
 
         # Movement keys handling
-        keys = pygame.key.get_pressed()
+        keys = self.controls.get_pressed()
 
         if keys[pygame.K_a] and not self.left_lock:
             self.right_lock = True
@@ -146,13 +193,23 @@ class Player(pygame.sprite.Sprite):
     # If space is pressed and the jump rect is touching the ground, jump automaticly right after landing
     # This makes the game feel more responsive and prevents the "aw shit i pressed space why didnt i jump" - situations
     def test_for_jump(self):
-        for tiles in self.solid_list:
-            if self.jump_rect.colliderect(tiles.rect):
+        if self.bodies is not None:
+            if self.bodies.grid.collide(self.jump_rect):
                 self.should_jump = True
-                break
+        elif self.collide_solids(self.jump_rect):
+            self.should_jump = True
+
+    # Get the walls colliding with rect, using the solid grid if there is one
+    def collide_solids(self, rect):
+        if self.solid_grid is not None:
+            return self.solid_grid.collide(rect)
+
+        return [tiles for tiles in self.solid_list if rect.colliderect(tiles.rect)]
 
     # Movement and collision detection
     def movement(self):
+        self.last_image_rect.update(self.image_rect)
+
         self.events()
 
         # Change direciton based on velocity
@@ -166,7 +223,7 @@ class Player(pygame.sprite.Sprite):
             self.rect.x += self.x_velocity
 
         # Check if the player hit any walls during X-movement
-        hit_list = pygame.sprite.spritecollide(self, self.solid_list, False)
+        hit_list = self.collide_solids(self.rect)
         for hits in hit_list:
             # If top solid is true, the tile can be moved through on the X-Axis
             if self.direction == "right":
@@ -187,7 +244,7 @@ class Player(pygame.sprite.Sprite):
                 self.y_velocity = -5
 
         # Check if the player hit any walls during Y-movement
-        hit_list = pygame.sprite.spritecollide(self, self.solid_list, False)
+        hit_list = self.collide_solids(self.rect)
         for hits in hit_list:
             if self.y_velocity > 0:
                 self.rect.bottom = hits.rect.top
@@ -208,6 +265,55 @@ class Player(pygame.sprite.Sprite):
         else:
             self.jumping = True
 
+        self.place_rects()
+
+    # Read the keys and hand the player's position and velocity to the body array, before the body array runs its step
+    def begin_movement(self):
+        self.last_image_rect.update(self.image_rect)
+
+        self.events()
+
+        # Change direciton based on velocity
+        if self.x_velocity > 0:
+            self.direction = "right"
+        if self.x_velocity < 0:
+            self.direction = "left"
+
+        # The player only moves on the X-Axis while moving, even if it still has some X velocity left
+        self.bodies.set(self.body, self.rect, self.x_velocity if self.moving else 0, self.y_velocity)
+
+    # Take the player's position and velocity back from the body array after its step, and react to what it hit
+    def end_movement(self):
+        self.rect.x, self.rect.y = (self.bodies.x[self.body].item(), self.bodies.y[self.body].item())
+        if self.moving:
+            self.x_velocity = self.bodies.x_velocity[self.body].item()
+        self.y_velocity = self.bodies.y_velocity[self.body].item()
+
+        hit_x = self.bodies.hit_x[self.body].item()
+        hit_y = self.bodies.hit_y[self.body].item()
+
+        # Keep a little X velocity after hitting a wall, like movement does
+        if hit_x:
+            self.x_velocity = hit_x * settings.player_acc
+
+        if hit_y > 0:
+            self.y_velocity = settings.player_grav
+            self.jumping = False
+
+            if self.should_jump:
+                self.jump()
+                self.should_jump = False
+        else:
+            self.jumping = True
+
+            # Cut jump if space is not pressed
+            if self.y_velocity < -5 and not self.space:
+                self.y_velocity = -5
+
+        self.place_rects()
+
+    # Move the jump rect and image rect to where the player is
+    def place_rects(self):
         # Reposition jump Rect
         self.jump_rect.center = self.rect.center
         self.jump_rect.top = self.rect.bottom
@@ -216,74 +322,139 @@ class Player(pygame.sprite.Sprite):
         self.image_rect.center = self.rect.center
         self.image_rect.bottom = self.rect.bottom
 
-    # Player drawing function
-    def draw(self, display):
-        display.blit(self.image, self.image_rect)
+    # Player drawing function, x_offset and y_offset are used to draw the player relative to the camera
+    # alpha is how far the frame is between the last two simulation steps
+    def draw(self, display, x_offset=0, alpha=1, y_offset=0):
+        return display.blit(self.image, interpolate(self.last_image_rect, self.image_rect, alpha).move(x_offset, y_offset))
 
 # Lightning wizard class
 class Lightning_Wizard(Player):
     # Initialize the lightning wizard
-    def __init__(self, x, y, solid_list):
-        Player.__init__(self, x, y, solid_list)
+    def __init__(self, x, y, solid_list, solid_grid=None, controls=inputs.keyboard, bodies=None):
+        Player.__init__(self, x, y, solid_list, solid_grid, controls, bodies)
 
-    # Lightning wizard attack function
-    def attack(self, level):
-        l = Lightning(pygame.mouse.get_pos()[0] + level.cam_x_offset, level.walls, level.generators)
+    # Lightning wizard attack function, x is where on the screen the attack was aimed
+    def attack(self, level, x):
+        l = Lightning(x + level.cam_x_offset, level.cam_y_offset, level.generators)
+
+        # Change height upon collision with walls, ignoring the top layer tiles
+        l.rect.bottom = level.find_floor(l.rect)
         return l
 
     # Update the lightning wizard
     def update(self):
         self.movement()
 
-# Wall class
-class Wall(pygame.sprite.Sprite):
-    # Initialize the wall class
-    def __init__(self, x, y, w, h, color=settings.black, image=None):
-        pygame.sprite.Sprite.__init__(self)
+# Block class, a wall, exit or level border
+# Blocks never move, so they aren't sprites and only keep their rect, their shared image and if they are solid
+class Block:
+    __slots__ = ("rect", "image", "solid")
+
+    # Initialize the block class
+    def __init__(self, x, y, w, h, color=settings.black, image=None, solid=True):
         if image is None:
-            self.image = pygame.Surface((w, h))
-            self.image.fill(color)
+            self.image = images.solid((w, h), color)
         else:
-            self.image = image
-
-        self.image.convert_alpha()
-
-        self.dead = False
+            self.image = images.image(image)
 
         self.rect = self.image.get_rect()
         self.rect.x = x
         self.rect.y = y
 
+        self.solid = solid
+
 # Door class
 class Door(pygame.sprite.Sprite):
     # Initialize the door class
-    def __init__(self, x, y, id):
+    def __init__(self, x, y, id, solid_grid=None):
         pygame.sprite.Sprite.__init__(self)
 
-        self.image = pygame.Surface((32, 96))
-        self.image.fill(settings.black)
+        self.image = images.solid((32, 96), settings.black)
         self.rect = self.image.get_rect()
         self.rect.x, self.rect.y = (x, y)
 
         self.orig_y = self.rect.y
 
+        # Where the door was after the previous simulation step, used to interpolate between steps
+        self.last_rect = self.rect.copy()
+
         self.id = id
 
         self.powered = False
 
+        # The door moves, so it has to keep its cells in the solid grid up to date
+        self.solid_grid = solid_grid
+
+    # Close the door again and put it back where it started
+    def reset(self):
+        self.rect.y = self.orig_y
+        self.last_rect.update(self.rect)
+        self.powered = False
+
+        if self.solid_grid is not None:
+            self.solid_grid.move(self)
+
+    # Test if the door has finished opening
+    def opened(self):
+        return self.rect.y <= self.orig_y - 96
+
     # Update the door class
     def update(self):
+        self.last_rect.update(self.rect)
+
         if self.powered and self.rect.y > self.orig_y - 96:
             self.rect.y -= 2
 
+            if self.solid_grid is not None:
+                self.solid_grid.move(self)
+
+# Doors and generators that share an id, powering any of the generators opens all of the doors
+class Circuit:
+    __slots__ = ("doors", "generators", "opening_doors", "powered")
+
+    # Initialize the circuit class, opening doors is the group of doors the level is animating
+    def __init__(self, opening_doors):
+        self.doors = []
+        self.generators = []
+        self.opening_doors = opening_doors
+
+        self.powered = False
+
+    # Power the circuit, this only does anything the first time
+    def power(self):
+        if self.powered:
+            return
+        self.powered = True
+
+        for generators in self.generators:
+            generators.powered = True
+
+        # The doors start opening, the level only updates doors while they are in opening doors
+        for doors in self.doors:
+            doors.powered = True
+            self.opening_doors.add(doors)
+
+    # Turn the circuit off and close its doors again
+    def reset(self):
+        self.powered = False
+
+        for generators in self.generators:
+            generators.powered = False
+
+        for doors in self.doors:
+            doors.reset()
+
 # Power generator class
-class Generator(pygame.sprite.Sprite):
-    # Initialize the generator class
-    def __init__(self, x, y, id, doors):
-        pygame.sprite.Sprite.__init__(self)
+# Generators never move, so they aren't sprites either and are baked into the static layer like blocks
+class Generator:
+    __slots__ = ("image", "rect", "id", "powered", "circuit")
+
+    # Generators can be walked through
+    solid = False
 
-        self.image = pygame.Surface((32, 64))
-        self.image.fill(settings.red)
+    # Initialize the generator class
+    def __init__(self, x, y, id, circuit):
+        self.image = images.solid((32, 64), settings.red)
         self.rect = self.image.get_rect()
         self.rect.x, self.rect.y = (x, y)
 
@@ -291,11 +462,8 @@ class Generator(pygame.sprite.Sprite):
 
         self.powered = False
 
-        self.doors = doors
+        self.circuit = circuit
 
-    # Update the generator class
-    def update(self):
-        if self.powered:
-            for doors in self.doors:
-                if doors.id == self.id:
-                    doors.powered = True
+    # Power the generator and the doors on its circuit
+    def power(self):
+        self.circuit.power()
@@ -1,9 +1,19 @@
 import pygame
+import bisect
 import random
+from array import array
 
 import sprites
 import settings
-import resources
+import collision
+import text
+import inputs
+import levels
+import images
+import tiles
+import physics
+import chunks
+from profiling import profiler
 
 # State template class
 class States(object):
@@ -14,75 +24,289 @@ class States(object):
         self.quit = False
         self.previous = None
 
-# Level template class
+    # Make the next draw update the whole display
+    def force_redraw(self):
+        pass
+
+# Level state, plays the level called name from the levels folder
 class Level(States):
     # Initialize the game state
-    def __init__(self):
+    def __init__(self, name):
         States.__init__(self)
+        self.name = name
+        self.next = "menu"
 
         # If quit on exit is true, the game will reset instead of going to the next level when exiting
         self.quit_on_exit = False
 
-    # Function that creates a level from a list and returns the level list
-    def create_level(self, level, solid=True, bg=False):
-        level_x = 0
+        # Level data of the level once it has been built
+        self.current_level = None
+
+        # Where the player's held keys are read from, the keyboard or a script when running headless
+        self.controls = inputs.keyboard
 
+        # Times the player has fallen out of the level
+        self.deaths = 0
+
+        # Body array the player moves with when the batched physics is turned on, see physics.py
+        self.bodies = None
+
+        # Screen shake has its own random generator, so drawing doesn't change the game's random sequence
+        self.shake_random = random.Random()
+
+    # Function that creates a level from compiled level data and returns the level data
+    def create_level(self, level):
         # Make the bottom-left tile aligned with the bottom-left of the screen
-        if len(level) <= 20:
+        if level.height <= 20:
             level_y = 0
         else:
-            level_y = 0 - (32 * (len(level) - 20))
-
-        for rows in level:
-            for cols in rows:
-                if cols == -1:
-                    w = sprites.Wall(level_x, level_y, 32, 32, color=settings.green)
-                    self.exits.add(w)
-                if "d" in str(cols):
-                    w = sprites.Door(level_x, level_y, int(cols[1:]))
-                    self.walls.add(w)
-                    self.doors.add(w)
-                if "g" in str(cols):
-                    w = sprites.Generator(level_x, level_y, int(cols[1:]), self.doors)
-                    self.generators.add(w)
-                if cols == 1:
-                    w = sprites.Wall(level_x, level_y, 32, 32)
-                    self.walls.add(w)
-
-                level_x += 32
-            level_x = 0
-            level_y += 32
+            level_y = 0 - (32 * (level.height - 20))
+        self.level_y = level_y
+
+        # Falling below the bottom of the level is a death
+        self.level_bottom = level_y + level.height * 32
+
+        self.plan_level(level)
+
+        # Doors and generators are grouped into circuits by their id, so powering a generator goes straight to its doors
+        for tile_id, col, row, id in level.entities:
+            if id not in self.circuits:
+                self.circuits[id] = sprites.Circuit(self.opening_doors)
+
+            if tile_id == levels.DOOR:
+                w = sprites.Door(col * 32, level_y + row * 32, id, self.solid_grid)
+                self.walls.add(w)
+                self.doors.add(w)
+                self.solid_grid.add(w)
+                self.circuits[id].doors.append(w)
+            if tile_id == levels.GENERATOR:
+                w = sprites.Generator(col * 32, level_y + row * 32, id, self.circuits[id])
+                self.generators.append(w)
+                self.circuits[id].generators.append(w)
 
         return level
 
+    # Work out where the walls and exits of every chunk of a level go, and store it in the level data
+    # This only scans the tiles and doesn't create any sprites or surfaces, so it can run on the preloader thread
+    def plan_level(self, level):
+        if level.chunk_walls is not None:
+            return
+
+        solid = [[level.tile(col, row) == levels.WALL for col in range(level.width)] for row in range(level.height)]
+
+        # Merge the solid tiles of every chunk into as few rectangles as possible
+        chunk_walls = {}
+        for first_row in range(0, level.height, settings.chunk_height):
+            rows = solid[first_row:first_row + settings.chunk_height]
+            for first_col in range(0, level.width, settings.chunk_width):
+                chunk_walls[first_col // settings.chunk_width, first_row // settings.chunk_height] = [
+                    (first_col + col, first_row + row, width, height)
+                    for col, row, width, height in collision.merge_tiles([cols[first_col:first_col + settings.chunk_width] for cols in rows])]
+
+        # Only the chunks with exits in them are in chunk exits
+        level.chunk_exits = {}
+        for index, tile_id in enumerate(level.tiles):
+            if tile_id == levels.EXIT:
+                col, row = (index % level.width, index // level.width)
+                level.chunk_exits.setdefault((col // settings.chunk_width, row // settings.chunk_height), []).append((col, row))
+
+        # Pick the tileset piece for every wall from its neighbours once, so drawing never has to look at them
+        level.wall_pieces = array("B", [piece for rows in tiles.autotile(solid) for piece in rows])
+
+        # List the wall rows of every column from top to bottom, so lightning never has to look for the walls it hits
+        level.column_walls = [array("H", [row for row in range(level.height) if solid[row][col]]) for col in range(level.width)]
+
+        level.chunk_walls = chunk_walls
+
+    # Get the top of the first wall or door below the top layer of rect (the top 32 pixels), in the columns rect covers
+    # Returns the bottom of rect if there is nothing there, used to find where lightning stops
+    def find_floor(self, rect):
+        level = self.current_level
+        floor = rect.bottom
+
+        # The first wall row below the top layer is found in every column's list of wall rows
+        first_row = -((self.level_y - rect.top - 32) // 32)
+        for col in range(max(0, rect.left // 32), min(level.width, (rect.right - 1) // 32 + 1)):
+            walls = level.column_walls[col]
+            index = bisect.bisect_left(walls, first_row)
+            if index < len(walls):
+                floor = min(floor, self.level_y + walls[index] * 32)
+
+        # Doors move, so they are checked on their own
+        for doors in self.doors:
+            if doors.rect.colliderect(rect) and floor > doors.rect.top >= rect.top + 32:
+                floor = doors.rect.top
+
+        return floor
+
+    # Get the chunks of the level a rect overlaps, as ranges of chunk columns and chunk rows
+    def chunk_range(self, rect):
+        chunk_width = settings.chunk_width * 32
+        chunk_height = settings.chunk_height * 32
+        level = self.current_level
+
+        cols = range(max(0, rect.left // chunk_width), min(-(-level.width // settings.chunk_width), (rect.right - 1) // chunk_width + 1))
+        rows = range(max(0, (rect.top - self.level_y) // chunk_height),
+                     min(-(-level.height // settings.chunk_height), (rect.bottom - 1 - self.level_y) // chunk_height + 1))
+        return cols, rows
+
+    # Materialize the chunks near the camera and evict the ones far away from it, camera is the part of the level on screen
+    def update_chunks(self, camera):
+        cols, rows = self.chunk_range(camera.inflate(settings.chunk_load_distance * 2, settings.chunk_load_distance * 2))
+
+        for row in rows:
+            for col in cols:
+                if (col, row) not in self.chunks:
+                    self.load_chunk((col, row))
+
+        # Chunks are only evicted once they are a chunk further away than where they get loaded,
+        # so going back and forth over the edge of a chunk doesn't keep loading it again
+        for index in list(self.chunks):
+            if not (cols.start - 1 <= index[0] <= cols.stop and rows.start - 1 <= index[1] <= rows.stop):
+                self.evict_chunk(index)
+
+    # Create the blocks of a chunk and add them to the collision
+    def load_chunk(self, index):
+        chunk = chunks.Chunk(index, self.current_level, self.level_y)
+        self.chunks[index] = chunk
+
+        for walls in chunk.walls:
+            self.walls.add(walls)
+            self.solid_grid.add(walls)
+        self.exits.update(chunk.exits)
+
+    # Remove the blocks of a chunk from the collision, its surface is kept to draw the next chunk on
+    def evict_chunk(self, index):
+        chunk = self.chunks.pop(index)
+
+        for walls in chunk.walls:
+            self.walls.discard(walls)
+            self.solid_grid.remove(walls)
+        self.exits.difference_update(chunk.exits)
+
+        if chunk.surface is not None:
+            self.spare_surfaces.append(chunk.surface)
+
     # Starting the Level state
     def init_level(self, level):
-        # Sprite groups
-        self.exits = pygame.sprite.Group()
+        # Sprite groups, only for the things that move
         self.magic = pygame.sprite.Group()
-        self.walls = pygame.sprite.Group()
-        self.generators = pygame.sprite.Group()
         self.doors = pygame.sprite.Group()
 
-        # Create the level and set current_level to its level list (used for camera movement)
+        # Doors that are opening right now, the only doors that are updated
+        self.opening_doors = pygame.sprite.Group()
+
+        # Maps every door and generator id to the circuit of doors and generators with that id
+        self.circuits = {}
+
+        # The things that never move, walls and exits are blocks and generators aren't sprites either
+        # Walls and exits only have the blocks of the chunks that are materialized right now
+        # The walls also have the doors and level borders in them, everything the player can't walk through
+        self.exits = set()
+        self.walls = set()
+        self.generators = []
+
+        # Spatial index of the walls and doors, so collision only checks the cells near the player
+        self.solid_grid = collision.Spatial_Grid()
+
+        # Chunks of the level that are materialized right now, by (chunk column, chunk row)
+        # Their walls, exits and generators are drawn once to their surfaces instead of every frame
+        self.chunks = {}
+
+        # Surfaces of evicted chunks, used again for the next chunks that are drawn
+        self.spare_surfaces = []
+
+        # Create the level and set current_level to its level data (used for camera movement)
         self.current_level = self.create_level(level)
 
-        # Level borders
-        self.left_border = sprites.Wall(-1, 0, 1, settings.display_height)
+        # Level borders, as high as the level (or the screen if the level is lower than it)
+        border_height = max(self.current_level.height * 32, settings.display_height)
+        self.left_border = sprites.Block(-1, self.level_y, 1, border_height)
         self.walls.add(self.left_border)
+        self.solid_grid.add(self.left_border)
 
-        self.right_border = sprites.Wall(len(self.current_level[0]) * 32, 0, 1, settings.display_height)
+        self.right_border = sprites.Block(self.current_level.width * 32, self.level_y, 1, border_height)
         self.walls.add(self.right_border)
-
-        # We blit surfaces to the world surface, then blit the world surface to the game display
-        self.world_surface = pygame.Surface((len(self.current_level[0]) * 32, settings.display_height))
+        self.solid_grid.add(self.right_border)
 
         # Camera variables
         self.cam_x_offset = 0
+        self.cam_y_offset = 0
+        self.last_cam_x_offset = 0 # Camera offsets after the previous simulation step, used to interpolate between steps
+        self.last_cam_y_offset = 0
+
+        # Only what is inside the camera is drawn, to the screen sized view surface
+        # The view surface is then blitted to the game display
+        self.view_surface = images.convert(pygame.Surface((settings.display_width, settings.display_height)))
+
+        # Dirty rect variables, used to only update the parts of the display that changed
+        self.drawn_camera = None
+        self.drawn_rects = []
 
         # Screen shake variables
         self.shake_amount = 10
 
+    # Get the part of the level that is inside the camera, alpha is how far the frame is between the last two simulation steps
+    def camera_rect(self, alpha=1):
+        cam_x_offset = self.last_cam_x_offset + (self.cam_x_offset - self.last_cam_x_offset) * alpha
+        cam_y_offset = self.last_cam_y_offset + (self.cam_y_offset - self.last_cam_y_offset) * alpha
+        return pygame.Rect(int(cam_x_offset), int(cam_y_offset), settings.display_width, settings.display_height)
+
+    # Move a camera offset on one axis towards the player and return it
+    # Position is the player's position on that axis, screen size the size of the screen on it and axis 0 for X or 1 for Y
+    # The camera only moves once the player leaves the dead zone in the middle of the screen,
+    # and then only covers part of the way there every step (settings.camera_follow) so it doesn't jerk around
+    @staticmethod
+    def follow(offset, position, screen_size, axis):
+        dead_zone = settings.camera_dead_zone[axis] / 2
+        target = position - screen_size / 2
+
+        if offset < target - dead_zone:
+            offset += (target - dead_zone - offset) * settings.camera_follow[axis]
+        elif offset > target + dead_zone:
+            offset += (target + dead_zone - offset) * settings.camera_follow[axis]
+
+        return offset
+
+    # Draw the chunks inside the camera to the view surface, drawing their surfaces first if they are outdated
+    # Returns True if any of the chunks had to be drawn
+    def draw_chunks(self, camera):
+        rendered = False
+        cols, rows = self.chunk_range(camera)
+
+        # Outside of the level there are no chunks, just the background
+        level = self.current_level
+        chunk_area = pygame.Rect(0, self.level_y, -(-level.width // settings.chunk_width) * settings.chunk_width * 32,
+                                 -(-level.height // settings.chunk_height) * settings.chunk_height * 32)
+        if not chunk_area.contains(camera):
+            self.view_surface.fill(settings.white)
+
+        for index in [(col, row) for row in rows for col in cols]:
+            chunk = self.chunks.get(index)
+            if chunk is None:
+                continue
+
+            if chunk.dirty:
+                surface = chunk.surface
+                if surface is None:
+                    surface = self.spare_surfaces.pop() if self.spare_surfaces else images.convert(pygame.Surface(chunk.rect.size))
+                chunk.render(surface, self.current_level, self.level_y, self.generators)
+                rendered = True
+
+            self.view_surface.blit(chunk.surface, (chunk.rect.x - camera.x, chunk.rect.y - camera.y))
+
+        return rendered
+
+    # Make the next draw update the whole display
+    def force_redraw(self):
+        self.drawn_camera = None
+
+    # Mark the surfaces of the chunks as outdated, they get drawn again before they are next on screen
+    # Call this whenever a static tile is added, removed or moved
+    def invalidate_chunks(self):
+        for chunk in self.chunks.values():
+            chunk.dirty = True
+
     # Common events function
     def events(self, event):
         if event.type == pygame.QUIT:
@@ -103,52 +327,198 @@ class Level(States):
                 else:
                     self.quit = True
 
-        if event.type == pygame.MOUSEBUTTONDOWN:
-            self.magic.add(self.player.attack(self))
+        # There can only be so many lightning bolts at once, clicks past that do nothing
+        if event.type == pygame.MOUSEBUTTONDOWN and len(self.magic) < settings.max_magic:
+            self.magic.add(self.player.attack(self, event.pos[0]))
 
     # Common updates function
     def updates(self):
+        self.last_cam_x_offset = self.cam_x_offset
+        self.last_cam_y_offset = self.cam_y_offset
+
+        # Doors are updated before the magic, so a door starts opening on the step after the lightning hit its generator
+        # A door is dropped from the opening doors once it has stopped moving
+        moved_doors = []
+        for doors in self.opening_doors.sprites():
+            doors.update()
+            if doors.last_rect.y != doors.rect.y:
+                moved_doors.append(doors)
+            elif doors.opened():
+                self.opening_doors.remove(doors)
+
+        # Doors are solid in the occupancy grid wherever they are, like they are for the sprite collision
+        # The cells the moving doors left are cleared first, then every door blocks its cells again in case another door shared them
+        if self.bodies is not None and moved_doors:
+            for doors in moved_doors:
+                self.bodies.grid.unblock(doors.last_rect)
+            for doors in self.doors:
+                self.bodies.grid.block(doors.rect)
+
         self.magic.update()
-        self.doors.update()
-        self.generators.update()
 
-        # Horizontal Camera scrolling
-        self.cam_x_offset = self.player.rect.x - settings.display_width / 2
+        # Camera scrolling, the camera is kept inside the level
+        # Levels narrower or lower than the screen don't scroll on that axis
+        self.cam_x_offset = self.follow(self.cam_x_offset, self.player.rect.x, settings.display_width, 0)
+        self.cam_y_offset = self.follow(self.cam_y_offset, self.player.rect.y, settings.display_height, 1)
 
         if self.cam_x_offset < 0:
             self.cam_x_offset = 0
 
-        if self.cam_x_offset > (len(self.current_level[0]) - 25) * 32:
-            self.cam_x_offset = (len(self.current_level[0]) - 25) * 32
+        max_cam_x_offset = max(0, self.current_level.width * 32 - settings.display_width)
+        if self.cam_x_offset > max_cam_x_offset:
+            self.cam_x_offset = max_cam_x_offset
 
-        # Slowly stop screen shake
-        if self.shake_amount > 0:
-            self.shake_amount -= 0.5
+        if self.cam_y_offset < self.level_y:
+            self.cam_y_offset = self.level_y
 
-        # If player is out of view, reset the game
-        if self.player.rect.top > settings.display_height:
-            self.startup()
+        max_cam_y_offset = max(self.level_y, self.level_bottom - settings.display_height)
+        if self.cam_y_offset > max_cam_y_offset:
+            self.cam_y_offset = max_cam_y_offset
 
-    # Common draws function
-    def draws(self, screen):
-        self.world_surface.fill(settings.white)
+        self.update_chunks(self.camera_rect())
 
-        # Draw the player, walls and exits
-        self.exits.draw(self.world_surface)
-        self.magic.draw(self.world_surface)
-        self.walls.draw(self.world_surface)
-        self.doors.draw(self.world_surface)
-        self.generators.draw(self.world_surface)
-        self.player.draw(self.world_surface)
+        # Slowly stop screen shake
+        if self.shake_amount > 0:
+            self.shake_amount -= 0.5
 
-        # Blit the world surface to the main display
-        # If shake amount is more than 0, blit the world at a random location between
+        # If player has fallen out of the level, reset the game
+        if self.player.rect.top > self.level_bottom:
+            self.deaths += 1
+            self.reset()
+
+    # Common draws function, alpha is how far the frame is between the last two simulation steps
+    # Returns the list of display rects that changed, or None if the whole display has to be updated
+    def draws(self, screen, alpha=1):
+        camera = self.camera_rect(alpha)
+
+        # The chunk surfaces already have the walls, exits and generators on them, so only the moving sprites are drawn on top
+        rendered = self.draw_chunks(camera)
+
+        # The whole display changes when the camera scrolls, the screen shakes or a chunk on screen is drawn again
+        full_update = camera.topleft != self.drawn_camera or self.shake_amount > 0 or rendered
+
+        # Draw the magic, doors and player, skipping everything outside the camera
+        # Doors and the player move, so they are drawn in between their last two positions
+        drawn_rects = []
+        for magic in self.magic:
+            if magic.rect.colliderect(camera):
+                drawn_rects.append(magic.draw(self.view_surface, -camera.x, -camera.y))
+        for doors in self.doors:
+            if doors.rect.colliderect(camera):
+                rect = sprites.interpolate(doors.last_rect, doors.rect, alpha)
+                drawn_rects.append(self.view_surface.blit(doors.image, rect.move(-camera.x, -camera.y)))
+        drawn_rects.append(self.player.draw(self.view_surface, -camera.x, alpha, -camera.y))
+
+        # Blit the view surface to the main display
+        # If shake amount is more than 0, blit the view at a random location between
         # negative and positive shake amount, instead of 0, 0
         if self.shake_amount > 0:
-            screen.blit(self.world_surface, (random.randint(int(-self.shake_amount), int(self.shake_amount))-self.cam_x_offset,
-                                                        random.randint(int(-self.shake_amount), int(self.shake_amount))))
+            screen.blit(self.view_surface, (self.shake_random.randint(int(-self.shake_amount), int(self.shake_amount)),
+                                            self.shake_random.randint(int(-self.shake_amount), int(self.shake_amount))))
         else:
-            screen.blit(self.world_surface, (0-self.cam_x_offset, 0))
+            screen.blit(self.view_surface, (0, 0))
+
+        # Everything drawn this frame and everything drawn last frame has changed on the display
+        dirty_rects = drawn_rects + self.drawn_rects
+        self.drawn_rects = drawn_rects
+
+        # Remember the camera position from a shaking frame as invalid, so the frame after the shake is a full update
+        self.drawn_camera = camera.topleft if self.shake_amount <= 0 else None
+
+        if full_update:
+            return None
+        return dirty_rects
+
+    # Cleaning up the game state
+    def cleanup(self):
+        pass
+
+    # Starting the game state
+    # The level is only built the first time, after that it is reset in place
+    def startup(self):
+        if not self.built():
+            self.build(self.prepare())
+
+        self.reset()
+
+    # Get the level data of the level
+    def load_level(self):
+        return levels.load(self.name)
+
+    # Load the level data and plan the level, without creating any sprites or surfaces
+    # This is the slow part of building a level, and it can run on the preloader thread
+    def prepare(self):
+        level = self.load_level()
+        self.plan_level(level)
+        return level
+
+    # Test if the level has been built
+    def built(self):
+        return self.current_level is not None
+
+    # Build the level from its level data
+    def build(self, level):
+        # Initializing the common level variables
+        self.init_level(level)
+
+        # The batched physics is opt-in and needs numpy
+        if settings.vector_physics and physics.numpy is not None:
+            self.bodies = physics.Body_Array(physics.Occupancy_Grid(level, self.level_y))
+
+        # Creating an instance of the player
+        self.player = sprites.Lightning_Wizard(50, 450, self.walls, self.solid_grid, self.controls, self.bodies)
+
+    # Put the level back the way it was when it was built, without building anything again
+    # Used when the level starts and every time the player dies
+    def reset(self):
+        for circuits in self.circuits.values():
+            circuits.reset()
+        self.opening_doors.empty()
+
+        if self.bodies is not None:
+            self.bodies.grid.reset()
+            for doors in self.doors:
+                self.bodies.grid.block(doors.rect)
+
+        self.magic.empty()
+
+        self.player.controls = self.controls
+        self.player.reset()
+
+        # Camera variables
+        self.cam_x_offset = 0
+        self.cam_y_offset = 0
+        self.last_cam_x_offset = 0
+        self.last_cam_y_offset = 0
+        self.update_chunks(self.camera_rect())
+
+        # Screen shake variables
+        self.shake_amount = 10
+
+        self.force_redraw()
+        self.drawn_rects = []
+
+    # State event handling
+    def get_event(self, event):
+        self.events(event)
+
+    # Run one simulation step of the game state
+    def update(self):
+        with profiler.span("physics"):
+            if self.bodies is None:
+                self.player.update()
+            else:
+                self.player.begin_movement()
+                self.bodies.step()
+                self.player.end_movement()
+
+        self.updates()
+
+        self.test_for_exits(self.player)
+
+    # game state drawing
+    def draw(self, screen, alpha=1):
+        return self.draws(screen, alpha)
 
     # Test if the player is within an exit's boundaries
     def test_for_exits(self, player):
@@ -170,18 +540,20 @@ class Menu(States):
 
     # Font rendering function
     def render_text(self, msg, color, size, dest_surf, pos):
-        font = pygame.font.Font(settings.font_file, size)
-
-        font_surf = font.render(msg, False, color)
+        font_surf = text.render(msg, color, size)
         font_rect = font_surf.get_rect()
         font_rect.center = pos
 
-        dest_surf.blit(font_surf, font_rect)
+        return dest_surf.blit(font_surf, font_rect)
 
     # Cleaning up the menu state
     def cleanup(self):
         pass
 
+    # Make the next draw update the whole display
+    def force_redraw(self):
+        self.drawn_colors = None
+
     # Starting the menu state
     def startup(self):
         self.play_color = settings.orange
@@ -189,6 +561,9 @@ class Menu(States):
 
         self.selected = "play"
 
+        # The colors the menu was last drawn with, None means the whole display has to be drawn
+        self.drawn_colors = None
+
     # State event handling
     def get_event(self, event):
         if event.type == pygame.KEYDOWN:
@@ -204,9 +579,7 @@ class Menu(States):
                     quit()
 
     # Update the menu state
-    def update(self, display):
-        self.draw(display)
-
+    def update(self):
         if self.selected == "play":
             self.play_color = settings.orange
         else:
@@ -218,200 +591,27 @@ class Menu(States):
             self.quit_color = settings.black
 
     # Menu state drawing
-    def draw(self, screen):
-        screen.fill((255, 255, 255))
-
-        self.render_text("PLAY", self.play_color, 75, screen, (400, 325))
-        self.render_text("QUIT", self.quit_color, 75, screen, (400, 400))
-
-# Level 1 state
-class Level_1(Level):
-    # Initialize the game state
-    def __init__(self):
-        Level.__init__(self)
-        self.next = "level_2"
+    # Returns the list of display rects that changed, or None if the whole display has to be updated
+    def draw(self, screen, alpha=1):
+        # Nothing has to be drawn if the menu looks the same as last frame
+        if self.drawn_colors == (self.play_color, self.quit_color):
+            return []
 
-    # Cleaning up the game state
-    def cleanup(self):
-        pass
-
-    # Starting the game state
-    def startup(self):
-        # Level list
-        self.level_list = [
-            [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, -1, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, -1, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1]
-        ]
-
-        # Initializing the common level variables
-        self.init_level(self.level_list)
-
-        # Creating an instance of the player
-        self.player = sprites.Lightning_Wizard(50, 450, self.walls)
-
-    # State event handling
-    def get_event(self, event):
-        self.events(event)
-
-
-    # Update the game state
-    def update(self, display):
-        self.player.update()
-
-        self.updates()
-
-        self.test_for_exits(self.player)
-
-        self.draw(display)
-
-    # game state drawing
-    def draw(self, screen):
-        self.draws(screen)
-
-# Level 2 state
-class Level_2(Level):
-    # Initialize the game state
-    def __init__(self):
-        Level.__init__(self)
-        self.next = "menu"
-
-    # Cleaning up the game state
-    def cleanup(self):
-        pass
-
-    # Starting the game state
-    def startup(self):
-        # Level list
-        self.level_list = [
-            [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, "d1", 0, 0, 0, 0, "d1", 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, -1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, -1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, "g1", 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1]
-        ]
-
-        # Initializing the common level variables
-        self.init_level(self.level_list)
-
-        # Creating an instance of the player
-        self.player = sprites.Lightning_Wizard(50, 450, self.walls)
-
-    # State event handling
-    def get_event(self, event):
-        self.events(event)
-
-
-    # Update the game state
-    def update(self, display):
-        self.player.update()
-
-        self.updates()
-
-        self.test_for_exits(self.player)
-
-        self.draw(display)
-
-    # game state drawing
-    def draw(self, screen):
-        self.draws(screen)
-
-# Level 3 state
-class Level_3(Level):
-    # Initialize the game state
-    def __init__(self):
-        Level.__init__(self)
-        self.next = "menu"
-
-    # Cleaning up the game state
-    def cleanup(self):
-        pass
-
-    # Starting the game state
-    def startup(self):
-        # Level list
-        self.level_list = [
-            [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, -1, 0, 1],
-            [1, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, -1, 0, 1],
-            [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1]
-        ]
-
-        # Initializing the common level variables
-        self.init_level(self.level_list)
-
-        # Creating an instance of the player
-        self.player = sprites.Lightning_Wizard(50, 450, self.walls)
-
-    # State event handling
-    def get_event(self, event):
-        self.events(event)
-
-
-    # Update the game state
-    def update(self, display):
-        self.player.update()
-
-        self.updates()
+        screen.fill((255, 255, 255))
 
-        self.test_for_exits(self.player)
+        dirty_rects = [self.render_text("PLAY", self.play_color, 75, screen, (400, 325)),
+                       self.render_text("QUIT", self.quit_color, 75, screen, (400, 400))]
 
-        self.draw(display)
+        first_draw = self.drawn_colors is None
+        self.drawn_colors = (self.play_color, self.quit_color)
 
-    # game state drawing
-    def draw(self, screen):
-        self.draws(screen)
+        if first_draw:
+            return None
+        return dirty_rects
 
 # List of all levels (used for randomizing level order)
 def setup_list():
-    return [Level_1(), Level_2(), Level_3()]
+    return [Level(name) for name in levels.level_names()]
 
-level_list = setup_list()
+# The levels of the current session, set up by the game when a session starts
+level_list = []
@@ -0,0 +1,85 @@
+import asyncio
+import functools
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import settings
+
+# Runs coroutines scheduled by the states next to the game loop, and runs blocking work like file I/O on worker threads
+# With the asyncio game loop the coroutines run on its event loop, with the synchronous game loop the scheduler has an event loop
+# of its own that is stepped once every frame, so the same coroutines work with both
+class Scheduler:
+    # Initialize the scheduler class
+    def __init__(self):
+        # The scheduler's own event loop and the worker threads are only created the first time they are needed
+        self.event_loop = None
+        self.executor = None
+
+        # Tasks that haven't finished yet, asyncio only keeps weak references to them
+        self.tasks = set()
+
+    # Get the event loop coroutines run on, the running one if there is one
+    def get_event_loop(self):
+        try:
+            return asyncio.get_running_loop()
+        except RuntimeError:
+            if self.event_loop is None:
+                self.event_loop = asyncio.new_event_loop()
+            return self.event_loop
+
+    # Schedule a coroutine to run in the background, returns its task
+    def spawn(self, coroutine):
+        task = self.get_event_loop().create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.task_done)
+        return task
+
+    # Forget a finished task, printing the error if it failed so it doesn't go unnoticed
+    def task_done(self, task):
+        self.tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            traceback.print_exception(type(task.exception()), task.exception(), task.exception().__traceback__)
+
+    # Run a blocking function on a worker thread, returns an awaitable of its result
+    def run_blocking(self, function, *args, **kwargs):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=settings.task_workers, thread_name_prefix="tasks")
+        return self.get_event_loop().run_in_executor(self.executor, functools.partial(function, *args, **kwargs))
+
+    # Sleep until deadline, a time.perf_counter() time
+    # asyncio.sleep can wake up a millisecond or more late, so the end of the wait is spent yielding to the other tasks instead
+    async def sleep_until(self, deadline):
+        remaining = deadline - time.perf_counter() - settings.frame_spin_time
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+
+        await asyncio.sleep(0)
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(0)
+
+    # Run the coroutines that are ready on the scheduler's own event loop, used by the synchronous game loop every frame
+    def step(self):
+        if self.event_loop is not None:
+            self.event_loop.run_until_complete(asyncio.sleep(0))
+
+    # Cancel the tasks that are still running and wait for them to stop
+    async def cancel_tasks(self):
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    # Cancel the tasks that are still running and stop the worker threads
+    def shutdown(self):
+        if self.event_loop is not None:
+            self.event_loop.run_until_complete(self.cancel_tasks())
+            self.event_loop.close()
+            self.event_loop = None
+
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        self.tasks = set()
+
+# The scheduler the game and its states share
+scheduler = Scheduler()
@@ -0,0 +1,58 @@
+from collections import OrderedDict
+
+import pygame
+
+import settings
+
+# Least recently used cache, drops the oldest entry once it holds more than max_size entries
+class LRU_Cache:
+    # Initialize the LRU cache class
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+
+    # Get an entry and mark it as recently used, returns None if it is not cached
+    def get(self, key):
+        if key not in self.entries:
+            return None
+
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    # Add an entry, evicting the least recently used one if the cache is full
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+# Font objects keyed by (file, size), so the font file is only opened and parsed once
+font_cache = LRU_Cache(settings.font_cache_size)
+
+# Rendered text surfaces keyed by (message, color, size, file), so the glyphs are only rasterized once
+text_cache = LRU_Cache(settings.text_cache_size)
+
+# Get a font, loading it from disk only if it isn't cached
+def get_font(size, font_file=settings.font_file):
+    font = font_cache.get((font_file, size))
+    if font is None:
+        font = pygame.font.Font(font_file, size)
+        font_cache.put((font_file, size), font)
+
+    return font
+
+# Get the surface for a rendered message, rendering it only if it isn't cached
+# The returned surface is shared, so it must not be drawn on
+def render(msg, color, size, font_file=settings.font_file):
+    key = (msg, tuple(color), size, font_file)
+
+    font_surf = text_cache.get(key)
+    if font_surf is None:
+        font_surf = get_font(size, font_file).render(msg, False, color)
+        text_cache.put(key, font_surf)
+
+    return font_surf
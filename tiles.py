@@ -1,9 +1,21 @@
+import os
+
 import pygame
 
-from resources import *
+import settings
+import images
+
+# Auto-tiling pieces, in the order they are laid out in a tileset image
+# A piece number is the position in this list plus one, 0 means no tile
+pieces = ["top", "left", "bottom", "right",
+          "tlcorner", "trcorner", "blcorner", "brcorner",
+          "tl_90deg", "tr_90deg", "bl_90deg", "br_90deg",
+          "plain"]
+piece_numbers = {name: number for number, name in enumerate(pieces, 1)}
 
 class Tileset:
     # Initialize the tileset class
+    # Id is the tile id of the first piece, the other pieces get the ids after it
     def __init__(self, image, id):
         self.image = image
 
@@ -12,67 +24,67 @@ class Tileset:
         # Getting the individual tile images from the tileset
         self.top = {
                     "image": self.image.subsurface((0, 0, 32, 32)),
-                    "id": self.id + 0.01
+                    "id": self.id + 0
                     }
 
         self.left = {
                      "image": self.image.subsurface((32, 0, 32, 32)),
-                     "id": self.id + 0.02
+                     "id": self.id + 1
                      }
 
         self.bottom = {
                        "image": self.image.subsurface((64, 0, 32, 32)),
-                       "id": self.id + 0.03
+                       "id": self.id + 2
                        }
 
         self.right = {
                       "image": self.image.subsurface((96, 0, 32, 32)),
-                      "id": self.id + 0.04
+                      "id": self.id + 3
                       }
 
         self.tlcorner = {
                          "image": self.image.subsurface((0, 32, 32, 32)),
-                         "id": self.id + 0.05
+                         "id": self.id + 4
                          }
 
         self.trcorner = {
                          "image": self.image.subsurface((32, 32, 32, 32)),
-                         "id": self.id + 0.06
+                         "id": self.id + 5
                          }
 
         self.blcorner = {
                          "image": self.image.subsurface((64, 32, 32, 32)),
-                         "id": self.id + 0.07
+                         "id": self.id + 6
                          }
 
         self.brcorner = {
                          "image": self.image.subsurface((96, 32, 32, 32)),
-                         "id": self.id + 0.08
+                         "id": self.id + 7
                          }
 
         self.tl_90deg = {
                          "image": self.image.subsurface((0, 64, 32, 32)),
-                         "id": self.id + 0.09
+                         "id": self.id + 8
                          }
 
         self.tr_90deg = {
                          "image": self.image.subsurface((32, 64, 32, 32)),
-                         "id": self.id + 0.10
+                         "id": self.id + 9
                          }
 
         self.bl_90deg = {
                          "image": self.image.subsurface((64, 64, 32, 32)),
-                         "id": self.id + 0.11
+                         "id": self.id + 10
                          }
 
         self.br_90deg = {
                          "image": self.image.subsurface((96, 64, 32, 32)),
-                         "id": self.id + 0.12
+                         "id": self.id + 11
                          }
 
         self.plain = {
                       "image": self.image.subsurface((0, 96, 32, 32)),
-                      "id": self.id + 0.13
+                      "id": self.id + 12
                       }
 
         self.all_tiles = [self.top, self.left, self.bottom, self.right,
@@ -80,10 +92,95 @@ class Tileset:
                           self.tl_90deg, self.tr_90deg, self.bl_90deg, self.br_90deg,
                           self.plain]
 
-tileset_grass = Tileset(tileset_grass, 1)
-tileset_details = Tileset(tileset_details, 2)
-tileset_oak_trees = Tileset(tileset_oak_trees, 3)
-tileset_house_1 = Tileset(tileset_house_1, 4)
-tileset_platforms = Tileset(tileset_platforms, 5)
-
-tileset_list = [tileset_grass, tileset_details, tileset_oak_trees, tileset_house_1, tileset_platforms]
+# All tilesets packed into a single converted surface, so every tile is drawn from the same surface
+class Atlas:
+    # Initialize the atlas class, tileset images is a list of tileset surfaces
+    def __init__(self, tileset_images):
+        self.tilesets = [Tileset(image, num * len(pieces) + 1) for num, image in enumerate(tileset_images)]
+
+        # Every tileset is a row of the atlas, with its pieces in the same order as their ids
+        surface = pygame.Surface((len(pieces) * 32, len(self.tilesets) * 32), pygame.SRCALPHA)
+        for tileset in self.tilesets:
+            for tile in tileset.all_tiles:
+                surface.blit(tile["image"], self.tile_rect(tile["id"]))
+        self.image = images.convert(surface)
+
+    # Get the tile id of a piece number of a tileset
+    def tile_id(self, tileset_num, piece):
+        return self.tilesets[tileset_num].id + piece - 1
+
+    # Get where a tile is in the atlas
+    def tile_rect(self, tile_id):
+        return pygame.Rect((tile_id - 1) % len(pieces) * 32, (tile_id - 1) // len(pieces) * 32, 32, 32)
+
+    # Draw a tile to a surface
+    def draw(self, surface, tile_id, pos):
+        surface.blit(self.image, pos, self.tile_rect(tile_id))
+
+# Get the piece number for a solid cell from which of its neighbours are solid
+# Up, down, left and right are the cells next to it, the corners are the diagonal cells
+def pick_piece(up, down, left, right, up_left, up_right, down_left, down_right):
+    if not up:
+        if not left:
+            return piece_numbers["tlcorner"]
+        if not right:
+            return piece_numbers["trcorner"]
+        return piece_numbers["top"]
+
+    if not down:
+        if not left:
+            return piece_numbers["blcorner"]
+        if not right:
+            return piece_numbers["brcorner"]
+        return piece_numbers["bottom"]
+
+    if not left:
+        return piece_numbers["left"]
+    if not right:
+        return piece_numbers["right"]
+
+    # Every side is solid, so the only thing left to show is an inside corner
+    if not up_left:
+        return piece_numbers["tl_90deg"]
+    if not up_right:
+        return piece_numbers["tr_90deg"]
+    if not down_left:
+        return piece_numbers["bl_90deg"]
+    if not down_right:
+        return piece_numbers["br_90deg"]
+
+    return piece_numbers["plain"]
+
+# Work out the piece number of every cell of a grid of solid cells, 0 for cells that aren't solid
+# Cells outside the grid count as solid, so walls along the edge of a level join up with it
+# Solid is a list of rows of booleans, returns a list of rows of piece numbers
+def autotile(solid):
+    height = len(solid)
+    width = len(solid[0]) if solid else 0
+
+    def is_solid(col, row):
+        if col < 0 or row < 0 or col >= width or row >= height:
+            return True
+        return solid[row][col]
+
+    return [[pick_piece(is_solid(col, row - 1), is_solid(col, row + 1), is_solid(col - 1, row), is_solid(col + 1, row),
+                        is_solid(col - 1, row - 1), is_solid(col + 1, row - 1), is_solid(col - 1, row + 1), is_solid(col + 1, row + 1))
+             if solid[row][col] else 0 for col in range(width)] for row in range(height)]
+
+# The atlas is loaded the first time it is needed, atlas_loaded tells if that has been tried yet
+atlas = None
+atlas_loaded = False
+
+# Get the tileset atlas, loading the tileset images the first time
+# Returns None if there are no tileset images, then walls are drawn as plain colored rectangles
+def get_atlas():
+    global atlas, atlas_loaded
+
+    if not atlas_loaded:
+        atlas_loaded = True
+
+        paths = [os.path.join(settings.tileset_dir, file_name) for file_name in settings.tileset_files]
+        if paths and all(os.path.exists(path) for path in paths):
+            atlas = Atlas([pygame.image.load(path) for path in paths])
+
+    return atlas